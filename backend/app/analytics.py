@@ -0,0 +1,200 @@
+from datetime import date, datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Sales Rollups
+# create_order adds each sale to sales_daily / sales_daily_category inside its
+# transaction, and /analytics/dashboard reads only those rollups, so the cost of
+# a dashboard depends on the number of days shown, not on the number of orders.
+
+ROLLUP_SLOTS = 8 # Rows per day that concurrent checkouts spread their increments over
+REBUILD_SLOT = ROLLUP_SLOTS # Rebuilt history gets its own slot, never written by checkouts
+GRANULARITIES = ("day", "week", "month")
+DEFAULT_RANGE_DAYS = 30
+CONVERSION_RATE = 2.4 # Placeholder until storefront visits are tracked
+
+
+def _upsert_increment(db: Session, model, keys: dict, increments: dict) -> None:
+    # INSERT the row or add the increments to the existing one, in one statement
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(table).values(**keys, **increments)
+        stmt = stmt.on_duplicate_key_update({
+            name: table.c[name] + stmt.inserted[name] for name in increments
+        })
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(table).values(**keys, **increments)
+        stmt = stmt.on_conflict_do_update(index_elements=list(keys), set_={
+            name: table.c[name] + stmt.excluded[name] for name in increments
+        })
+    else:
+        result = db.execute(
+            update(table)
+            .where(*[table.c[name] == value for name, value in keys.items()])
+            .values({name: table.c[name] + value for name, value in increments.items()})
+        )
+        if result.rowcount:
+            return
+        stmt = insert(table).values(**keys, **increments)
+    db.execute(stmt)
+
+
+def record_order(db: Session, order_id: int, created_at: datetime, total_amount: float, category_totals: dict) -> None:
+    # category_totals: category -> (revenue, units)
+    day = created_at.date()
+    slot = order_id % ROLLUP_SLOTS
+    _upsert_increment(db, models.SalesDaily, {"day": day, "slot": slot}, {
+        "revenue": total_amount,
+        "orders_count": 1,
+    })
+    # Sorted, so every checkout locks category rows in the same order
+    for category in sorted(category_totals):
+        revenue, units = category_totals[category]
+        _upsert_increment(db, models.SalesDailyCategory, {"day": day, "category": category, "slot": slot}, {
+            "revenue": revenue,
+            "units": units,
+        })
+
+
+def _as_date(value) -> date:
+    # func.date() returns a string on SQLite and a date on MySQL
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def rebuild_sales_rollups(db: Session, start: date | None = None, end: date | None = None, batch_days: int = 31, progress=None) -> int:
+    # Recompute the rollups for [start, end] (default: whole order history) from orders
+    if start is None or end is None:
+        first, last = db.query(func.min(models.Order.created_at), func.max(models.Order.created_at)).one()
+        if first is None:
+            return 0
+        start = start or first.date()
+        end = end or last.date()
+    db.commit() # Whatever the session read so far stays out of the first window: see below
+
+    days_rebuilt = 0
+    window_start = start
+    while window_start <= end:
+        window_end = min(window_start + timedelta(days=batch_days - 1), end)
+        since = datetime.combine(window_start, datetime.min.time())
+        until = datetime.combine(window_end + timedelta(days=1), datetime.min.time())
+        order_day = func.date(models.Order.created_at)
+
+        # One transaction per window, opened by deleting its rollup rows: that
+        # locks them (and, under REPEATABLE READ, the gaps between them) the way
+        # checkouts' upserts do. A checkout that already incremented one commits
+        # first and its order is in the sums below; a later one waits and adds
+        # its increment to a live slot after the rebuild commits. Nothing is
+        # read before the DELETE: under REPEATABLE READ the first plain SELECT
+        # fixes the snapshot, which must not predate the locks.
+        db.query(models.SalesDaily).filter(models.SalesDaily.day.between(window_start, window_end)).delete(synchronize_session=False)
+        db.query(models.SalesDailyCategory).filter(models.SalesDailyCategory.day.between(window_start, window_end)).delete(synchronize_session=False)
+
+        daily = db.query(
+            order_day.label("day"),
+            func.coalesce(func.sum(models.Order.total_amount), 0).label("revenue"),
+            func.count(models.Order.id).label("orders_count"),
+        ).filter(models.Order.created_at >= since, models.Order.created_at < until).group_by(order_day).all()
+        if daily:
+            db.execute(insert(models.SalesDaily), [
+                {"day": _as_date(row.day), "slot": REBUILD_SLOT, "revenue": float(row.revenue), "orders_count": row.orders_count}
+                for row in daily
+            ])
+
+        by_category = db.query(
+            order_day.label("day"),
+            models.Product.category,
+            func.sum(models.OrderItem.price * models.OrderItem.quantity).label("revenue"),
+            func.sum(models.OrderItem.quantity).label("units"),
+        ).join(models.Order, models.OrderItem.order_id == models.Order.id).join(
+            models.Product, models.OrderItem.product_id == models.Product.id
+        ).filter(
+            models.Order.created_at >= since, models.Order.created_at < until
+        ).group_by(order_day, models.Product.category).all()
+        if by_category:
+            # Products without category may collapse into the same "" row
+            rows = {}
+            for row in by_category:
+                key = (_as_date(row.day), row.category or "")
+                revenue, units = rows.get(key, (0.0, 0))
+                rows[key] = (revenue + float(row.revenue or 0), units + int(row.units or 0))
+            db.execute(insert(models.SalesDailyCategory), [
+                {"day": day, "category": category, "slot": REBUILD_SLOT, "revenue": revenue, "units": units}
+                for (day, category), (revenue, units) in rows.items()
+            ])
+
+        db.commit()
+        days_rebuilt += (window_end - window_start).days + 1
+        if progress:
+            progress(days_rebuilt)
+        window_start = window_end + timedelta(days=1)
+    return days_rebuilt
+
+
+def _bucket(day: date, granularity: str) -> str:
+    if granularity == "week":
+        return (day - timedelta(days=day.weekday())).isoformat() # Monday of that week
+    if granularity == "month":
+        return day.strftime("%Y-%m")
+    return day.isoformat()
+
+
+def dashboard(db: Session, start: date | None = None, end: date | None = None, granularity: str = "day") -> dict:
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(GRANULARITIES)}")
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=DEFAULT_RANGE_DAYS)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    daily = db.query(
+        models.SalesDaily.day,
+        func.sum(models.SalesDaily.revenue).label("revenue"),
+        func.sum(models.SalesDaily.orders_count).label("orders"),
+    ).filter(models.SalesDaily.day.between(start, end)).group_by(models.SalesDaily.day).order_by(models.SalesDaily.day).all()
+
+    # Sales Trend
+    trend = {}
+    for row in daily:
+        bucket = trend.setdefault(_bucket(_as_date(row.day), granularity), [0.0, 0])
+        bucket[0] += float(row.revenue or 0)
+        bucket[1] += int(row.orders or 0)
+    sales_trend = [
+        {"date": label, "revenue": revenue, "orders": orders}
+        for label, (revenue, orders) in trend.items()
+    ]
+
+    total_revenue = sum(item["revenue"] for item in sales_trend)
+    total_orders = sum(item["orders"] for item in sales_trend)
+    avg_ticket = (total_revenue / total_orders) if total_orders > 0 else 0
+
+    # Category Distribution
+    categories = db.query(
+        models.SalesDailyCategory.category,
+        func.sum(models.SalesDailyCategory.revenue).label("value"),
+    ).filter(
+        models.SalesDailyCategory.day.between(start, end)
+    ).group_by(models.SalesDailyCategory.category).order_by(func.sum(models.SalesDailyCategory.revenue).desc()).all()
+
+    category_distribution = [
+        {"name": row.category, "value": float(row.value or 0)}
+        for row in categories if row.category
+    ]
+
+    return {
+        "totalRevenue": total_revenue,
+        "totalOrders": total_orders,
+        "conversionRate": CONVERSION_RATE,
+        "avgTicket": avg_ticket,
+        "salesTrend": sales_trend,
+        "categoryDistribution": category_distribution,
+    }
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, Header, Response, Query
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import schemas, auth, catalog, orders, users, responses, idempotency, pagination
+from .database import get_async_db, get_async_read_db
+
+# Async Hot Paths (ASYNC_DB=1)
+# Same routes and responses as the sync handlers in main.py. The query logic is
+# shared: AsyncSession.run_sync runs it against the async driver, so database
+# round trips await on the event loop instead of blocking a threadpool worker.
+
+router = APIRouter()
+
+
+@router.get("/products", response_model=schemas.PaginatedProductResponse)
+async def read_products(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=pagination.MAX_PAGE_SIZE),
+    q: str | None = None,
+    category: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    in_stock: bool | None = None,
+    sort_by: str | None = None, # price_asc, price_desc, newest
+    cursor: str | None = None, # next_cursor from the previous page (replaces skip)
+    include_total: bool = True,
+    fields: str | None = None, # Sparse items, e.g. id,name,price,image_url
+    facets: bool = False, # Add category / price range / availability counts
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    page = await db.run_sync(
+        catalog.list_products, skip=skip, limit=limit, q=q, category=category,
+        min_price=min_price, max_price=max_price, in_stock=in_stock,
+        sort_by=sort_by, cursor=cursor, include_total=include_total, with_facets=facets,
+    )
+    return responses.product_page(page, fields)
+
+
+@router.get("/products/{product_id}", response_model=schemas.Product)
+async def read_product(product_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    return await db.run_sync(catalog.get_product, product_id)
+
+
+@router.post("/token", response_model=schemas.Token)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await users.authenticate(db.run_sync, form_data.username, form_data.password)
+    return auth.create_user_token(user)
+
+
+async def get_current_user(token: str = Depends(auth.oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    claims = auth.decode_access_token(token)
+    if claims is None:
+        raise auth.credentials_exception()
+    user = auth.user_cache.get(claims.get("uid"))
+    if user is None:
+        user = await db.run_sync(users.load_user, claims)
+    return users.check_active(user)
+
+
+@router.post("/orders", response_model=schemas.OrderResponse)
+async def create_order(
+    order: schemas.OrderCreate,
+    response: Response,
+    idempotency_key: str | None = Header(None), # Retries with the same key return the first order
+    current_user: schemas.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await idempotency.run_async(
+        db, "orders", current_user.id, idempotency_key, order, schemas.OrderResponse,
+        lambda before_commit: db.run_sync(orders.place_order, current_user.id, order, before_commit), response,
+    )
@@ -1,14 +1,35 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Union
+from fastapi import HTTPException
+from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from . import cache
+
 # Configuration (Move to env vars in production)
 SECRET_KEY = "supersecretkey" # TODO: Change this
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor. Stored hashes with any other cost are rehashed on the next
+# successful login (verify_and_update), so changing it needs no migration.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -25,3 +46,191 @@ def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+def create_user_token(user) -> dict:
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # uid keys the user cache; adm lets clients render admin UI without a /users/me call
+    access_token = create_access_token(
+        data={"sub": user.email, "uid": user.id, "adm": bool(user.is_admin)}, expires_delta=access_token_expires
+    )
+    return {"access_token": access_token, "token_type": "bearer"}
+
+def decode_access_token(token: str) -> Union[dict, None]:
+    # Claims of a valid token, or None if it is invalid, expired or has no subject
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("sub") is None:
+        return None
+    return payload
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=401,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def rate_limited_exception(retry_after: int) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Too many failed login attempts, try again later",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+def login_exception() -> HTTPException:
+    return HTTPException(
+        status_code=401,
+        detail="Incorrect username or password",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+# Authenticated User Cache
+# id -> user record (schemas.User) for request auth, so a valid token costs no
+# query. Changes to is_active / is_admin call invalidate(), which bumps the user's
+# version in the cache backend: with a shared one (redis) every worker process
+# checks it on hits and reloads the user, instead of waiting for USER_CACHE_TTL.
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+class UserCache:
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # user_id -> (expires_at, user, version)
+        self._lock = threading.Lock()
+        self.versions = cache.NamespaceCache("users", cache.catalog_cache.backend)
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, user_id) -> int:
+        # Read before loading the user, so a change committed meanwhile isn't cached as current
+        return self.versions.version(user_id)
+
+    def get(self, user_id):
+        if user_id is None:
+            return None
+        version = self.version(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and (entry[0] < time.monotonic() or entry[2] != version):
+                del self._entries[user_id]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user, version: int) -> None:
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, user, version)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id) -> None:
+        self.versions.invalidate([user_id])
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "ttl": self.ttl,
+        }
+
+user_cache = UserCache()
+
+# Password Hashing Pool
+# bcrypt is CPU-bound (tens of ms per call). Async handlers hand it to this
+# dedicated pool (bcrypt releases the GIL) instead of running it on the event
+# loop or in the request threadpool; past HASH_MAX_PENDING calls they get a 503
+# rather than queueing without bound.
+
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "64"))
+
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_pending = 0
+_hash_lock = threading.Lock()
+
+async def run_hasher(fn, *args):
+    global _hash_pending
+    with _hash_lock:
+        if _hash_pending >= HASH_MAX_PENDING:
+            raise HTTPException(status_code=503, detail="Server busy, try again", headers={"Retry-After": "1"})
+        _hash_pending += 1
+    try:
+        return await asyncio.wrap_future(_hash_pool.submit(fn, *args))
+    finally:
+        with _hash_lock:
+            _hash_pending -= 1
+
+async def hash_password(password: str) -> str:
+    return await run_hasher(get_password_hash, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str):
+    # (verified, new_hash): new_hash is set when the stored hash uses another cost factor
+    return await run_hasher(pwd_context.verify_and_update, plain_password, hashed_password)
+
+# Login Rate Limiting
+# Failed logins per account in a fixed window, checked before any bcrypt work so
+# password guessing can't burn the hashing pool. Kept per process.
+
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", "5"))
+LOGIN_WINDOW_SECONDS = int(os.getenv("LOGIN_WINDOW_SECONDS", "300"))
+
+class LoginRateLimiter:
+    def __init__(self, max_failures: int = LOGIN_MAX_FAILURES, window: int = LOGIN_WINDOW_SECONDS, max_entries: int = 100000):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_entries = max_entries
+        self._failures = {} # account -> (window_start, failures)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def account_key(username: str) -> str:
+        return username.strip().lower()
+
+    def retry_after(self, username: str) -> Union[int, None]:
+        # Seconds until the account may try again, or None if it is not locked
+        now = time.monotonic()
+        with self._lock:
+            entry = self._failures.get(self.account_key(username))
+            if entry is None or entry[1] < self.max_failures:
+                return None
+            remaining = entry[0] + self.window - now
+            return max(int(remaining) + 1, 1) if remaining > 0 else None
+
+    def record_failure(self, username: str) -> None:
+        now = time.monotonic()
+        key = self.account_key(username)
+        with self._lock:
+            window_start, failures = self._failures.get(key, (now, 0))
+            if window_start + self.window <= now:
+                window_start, failures = now, 0
+            self._failures[key] = (window_start, failures + 1)
+            if len(self._failures) > self.max_entries:
+                # Drop expired windows so one-off typos don't accumulate
+                self._failures = {
+                    account: entry for account, entry in self._failures.items()
+                    if entry[0] + self.window > now
+                }
+
+    def reset(self, username: str) -> None:
+        with self._lock:
+            self._failures.pop(self.account_key(username), None)
+
+login_limiter = LoginRateLimiter()
@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Cache-aside layer for catalog reads.
+# Entries are never deleted one by one: every key embeds a namespace version and
+# writes bump that version, which makes all previously cached entries unreachable.
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory") # memory, redis, local-redis
+CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class CacheBackend:
+    name = "base"
+    shared = False # Seen by every API process, not just this one
+
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def set(self, key: str, value, ttl: int | None = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    def size(self) -> int | None:
+        return None
+
+
+class MemoryCache(CacheBackend):
+    """Per-process LRU with TTL. Counters live apart from entries so LRU never evicts them."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # key -> (value, expires_at)
+        self._counters = {}
+
+    def get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._counters.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisCache(CacheBackend):
+    """Shared cache over any redis-py compatible client (values stored as JSON)."""
+
+    name = "redis"
+
+    def __init__(self, client, shared: bool = True):
+        self.client = client
+        self.shared = shared
+
+    def get(self, key):
+        raw = self.client.get(key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, json.dumps(value), ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def incr(self, key):
+        return int(self.client.incr(key))
+
+
+class LocalRedis:
+    """In-process stand-in for the subset of the redis client used by RedisCache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {} # key -> (bytes, expires_at)
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, name):
+        with self._lock:
+            entry = self._live(name)
+            return entry[0] if entry else None
+
+    def set(self, name, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self._live(name):
+                return None
+            if isinstance(value, str):
+                value = value.encode()
+            elif isinstance(value, int):
+                value = str(value).encode()
+            self._data[name] = (value, time.monotonic() + ex if ex else None)
+            return True
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(1 for name in names if self._data.pop(name, None) is not None)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            entry = self._live(name)
+            value = int(entry[0]) + amount if entry else amount
+            self._data[name] = (str(value).encode(), entry[1] if entry else None)
+            return value
+
+
+def create_backend(kind: str = CACHE_BACKEND) -> CacheBackend:
+    if kind == "redis":
+        import redis # Optional dependency, only needed for the shared backend
+        return RedisCache(redis.Redis.from_url(REDIS_URL))
+    if kind == "local-redis":
+        return RedisCache(LocalRedis(), shared=False)
+    return MemoryCache()
+
+
+class NamespaceCache:
+    """Versioned cache namespace with hit/miss counters."""
+
+    def __init__(self, namespace: str, backend: CacheBackend, ttl: int = CACHE_TTL):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def version(self, item=None) -> int:
+        # item: the version of one item (e.g. a product), bumped by invalidate([item])
+        suffix = "" if item is None else f":{item}"
+        return int(self.backend.get(f"{self.namespace}:version{suffix}") or 0)
+
+    def key(self, name: str, **params) -> str:
+        # Normalized: parameter order and unset (None) parameters don't matter
+        parts = [f"{k}={params[k]}" for k in sorted(params) if params[k] is not None]
+        return f"{self.namespace}:v{self.version()}:{name}?{'&'.join(parts)}"
+
+    def get(self, key: str):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value):
+        self.backend.set(key, value, self.ttl)
+        return value
+
+    def invalidate(self, items=None) -> None:
+        self.backend.incr(f"{self.namespace}:version")
+        for item in items or ():
+            self.backend.incr(f"{self.namespace}:version:{item}")
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "version": self.version(),
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "ttl": self.ttl,
+        }
+
+
+catalog_cache = NamespaceCache("catalog", create_backend())
+# Stock levels, which checkouts change far more often than the rest of the catalog
+stock_cache = NamespaceCache("stock", catalog_cache.backend)
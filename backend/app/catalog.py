@@ -0,0 +1,204 @@
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from . import models, schemas, search, pagination, cache, facets
+
+# Catalog Reads
+# Shared by the sync routes in main.py and the async ones in async_api.py (which
+# call them through AsyncSession.run_sync), so both paths cache and page alike.
+
+
+def list_products(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    q: str | None = None,
+    category: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    in_stock: bool | None = None,
+    sort_by: str | None = None,
+    cursor: str | None = None,
+    include_total: bool = True,
+    with_facets: bool = False,
+) -> dict:
+    if q:
+        # Searches differing only in case, accents or spacing share an entry
+        q = " ".join(search.fold(q).split())
+        # Also when the listing is cached: it's dropped if the rebuild finds other processes' writes
+        search.get_search_engine().refresh_if_stale()
+    # Listings whose rows or counts depend on stock are also keyed by its version
+    stock_version = cache.stock_cache.version() if in_stock or with_facets else None
+    cache_key = cache.catalog_cache.key(
+        "products", skip=skip, limit=limit, q=q or None, category=category,
+        min_price=min_price, max_price=max_price, in_stock=in_stock,
+        sort_by=sort_by, cursor=cursor, include_total=include_total, facets=with_facets,
+        stock=stock_version,
+    )
+    # The page's stock levels are cached apart, so checkouts only drop those
+    stock_key = cache.stock_cache.key("page", listing=cache_key)
+    cached = cache.catalog_cache.get(cache_key)
+    if cached is not None:
+        return with_stock(db, cached, stock_key)
+
+    result = query_products(db, skip, limit, q, category, min_price, max_price, in_stock, sort_by, cursor, include_total)
+    if with_facets:
+        result["facets"] = facet_counts(db, q, category, min_price, max_price, in_stock)
+    response = schemas.PaginatedProductResponse.model_validate(result, from_attributes=True)
+    # Without facets the payload stays as it was: no "facets": null
+    payload = cache.catalog_cache.set(cache_key, response.model_dump(mode="json", exclude=None if with_facets else {"facets"}))
+    cache.stock_cache.set(stock_key, [item["stock_quantity"] for item in payload["items"]])
+    return payload
+
+
+def with_stock(db: Session, listing: dict, stock_key: str) -> dict:
+    # A cached listing with current stock levels: from the stock cache, or one
+    # primary key lookup for the page after a stock write
+    stock = cache.stock_cache.get(stock_key)
+    if stock is None:
+        ids = [item["id"] for item in listing["items"]]
+        levels = dict(db.query(models.Product.id, models.Product.stock_quantity).filter(models.Product.id.in_(ids)).all()) if ids else {}
+        stock = cache.stock_cache.set(stock_key, [levels.get(item["id"], item["stock_quantity"]) for item in listing["items"]])
+    return {**listing, "items": [{**item, "stock_quantity": level} for item, level in zip(listing["items"], stock)]}
+
+
+def facet_counts(db: Session, q, category, min_price, max_price, in_stock) -> dict:
+    # From the in-memory facet index, not GROUP BY queries; a search narrows
+    # the counts to its hits
+    product_ids = None
+    if q:
+        search_engine = search.get_search_engine()
+        search_engine.ensure_ready(db)
+        product_ids = [product_id for product_id, _ in search_engine.search(q)]
+    facets.facet_index.sync(db)
+    return facets.facet_index.counts(category, min_price, max_price, in_stock, product_ids)
+
+
+def ranked_page(db: Session, page_ids, matched, start, limit, include_total) -> dict:
+    # One page of search hits, in rank order, out of `matched` in total
+    rank = {product_id: i for i, product_id in enumerate(page_ids)}
+    products = db.query(models.Product).filter(models.Product.id.in_(page_ids)).all() if page_ids else []
+    products.sort(key=lambda p: rank[p.id])
+    has_more = start + limit < matched
+    return {
+        "items": products,
+        "total": matched if include_total else None,
+        "next_cursor": pagination.encode_cursor("relevance", offset=start + limit) if has_more else None,
+        "has_more": has_more,
+    }
+
+
+def query_products(db: Session, skip, limit, q, category, min_price, max_price, in_stock, sort_by, cursor, include_total):
+    query = db.query(models.Product)
+    
+    ranks = None
+    if q:
+        search_engine = search.get_search_engine()
+        search_engine.ensure_ready(db)
+        filtered = category or min_price is not None or max_price is not None or in_stock
+        sort = pagination.resolve_sort(sort_by, searching=True)
+        if sort == "relevance" and not filtered:
+            # Nothing for SQL to filter: page the ranked hits here and load only the page
+            position = pagination.decode_cursor(cursor, sort) if cursor else None
+            start = position.get("offset", 0) if position else skip
+            page_ids, matched = search_engine.search_page(q, start, limit)
+            return ranked_page(db, page_ids, matched, start, limit, include_total)
+        hits = search_engine.search(q)
+        if not hits:
+            return {"items": [], "total": 0 if include_total else None}
+        ranks = {product_id: rank for rank, (product_id, _) in enumerate(hits)}
+        query = query.filter(models.Product.id.in_(list(ranks)))
+    
+    if category:
+        query = query.filter(models.Product.category == category)
+
+    if min_price is not None:
+        query = query.filter(models.Product.price >= min_price)
+    
+    if max_price is not None:
+        query = query.filter(models.Product.price <= max_price)
+
+    if in_stock:
+        query = query.filter(models.Product.stock_quantity > 0)
+    
+    sort = pagination.resolve_sort(sort_by, searching=ranks is not None)
+    position = pagination.decode_cursor(cursor, sort) if cursor else None
+
+    if sort == "relevance":
+        # Filter the ranked hits in SQL, then order and page them by rank
+        matching_ids = [row.id for row in query.with_entities(models.Product.id)]
+        matching_ids.sort(key=ranks.__getitem__)
+        start = position.get("offset", 0) if position else skip
+        return ranked_page(db, matching_ids[start:start + limit], len(matching_ids), start, limit, include_total)
+
+    total = None
+    if include_total:
+        count_key = (q, category, min_price, max_price, bool(in_stock))
+        total = pagination.count_cache.get_or_count(count_key, query.count)
+
+    # Sorting
+    query = pagination.order_by(query, sort)
+    if position:
+        query = pagination.seek(query, sort, position)
+    else:
+        query = query.offset(skip)
+
+    # One extra row tells whether another page exists without counting
+    rows = query.limit(limit + 1).all()
+    products = rows[:limit]
+    has_more = len(rows) > limit
+    
+    return {
+        "items": products,
+        "total": total,
+        "next_cursor": pagination.cursor_after(sort, products[-1]) if has_more and products else None,
+        "has_more": has_more,
+    }
+
+
+def get_product(db: Session, product_id: int) -> dict:
+    cache_key = cache.catalog_cache.key("product", id=product_id, stock=cache.stock_cache.version(product_id))
+    cached = cache.catalog_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return cache.catalog_cache.set(cache_key, schemas.Product.model_validate(product).model_dump(mode="json"))
+
+
+def list_categories(db: Session) -> list[str]:
+    cache_key = cache.catalog_cache.key("categories")
+    cached = cache.catalog_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Efficiently get distinct categories
+    categories = db.query(models.Product.category).distinct().all()
+    # categories is a list of tuples [('Ropa',), ('Hogar',)], flatten it
+    return cache.catalog_cache.set(cache_key, [c[0] for c in categories if c[0]])
+
+
+def invalidate(product_ids=None) -> None:
+    # Called after every committed catalog write, with the ids of the products
+    # it changed when known (None: rebuild the facet index)
+    cache.catalog_cache.invalidate()
+    pagination.count_cache.clear()
+    facets.facet_index.mark_dirty(product_ids)
+
+
+def invalidate_search() -> None:
+    # Called when a periodic search index rebuild picked up writes made by other
+    # processes: cached listings and search totals may predate them
+    cache.catalog_cache.invalidate()
+    pagination.count_cache.clear(lambda key: key[0]) # Keys start with q
+
+
+def invalidate_stock(product_ids) -> None:
+    # Called after writes that only change stock (checkouts, stock movements):
+    # the rest of the catalog stays cached. Drops the listings' stock levels,
+    # these products' pages, stock-dependent listings and in-stock totals
+    cache.stock_cache.invalidate(product_ids)
+    pagination.count_cache.clear(lambda key: key[-1]) # Keys end with in_stock
+    facets.facet_index.mark_dirty(product_ids)
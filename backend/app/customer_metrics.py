@@ -0,0 +1,211 @@
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Customer Metrics
+# Per-user totals live in the customer_metrics rollup table. create_order keeps
+# it current (record_order); rebuild_customer_metrics recomputes it from orders.
+# Both lock the user's row before reading or writing it, so a rebuild can run
+# while customers check out.
+
+VIP_MIN_SPENT = 100000
+FREQUENT_MIN_ORDERS = 6 # "more than 5 orders"
+LTV_FULL_SCORE_SPENT = 500000 # Spend that maps to an LTV score of 100
+LTV_SPENT_PER_POINT = LTV_FULL_SCORE_SPENT / 100
+
+
+def compute_tags(total_spent: float, orders_count: int) -> list[str]:
+    tags = []
+    if total_spent > VIP_MIN_SPENT:
+        tags.append("VIP")
+    if orders_count >= FREQUENT_MIN_ORDERS:
+        tags.append("Frecuente")
+    if orders_count == 0:
+        tags.append("Nuevo")
+    return tags
+
+
+def compute_ltv_score(total_spent: float) -> int:
+    return min(int(total_spent / LTV_SPENT_PER_POINT), 100) # Simple normalization
+
+
+def refresh_derived(metrics: models.CustomerMetrics) -> None:
+    metrics.tags = ",".join(compute_tags(metrics.total_spent, metrics.orders_count))
+    metrics.ltv_score = compute_ltv_score(metrics.total_spent)
+
+
+def _ensure_rows(db: Session, user_ids) -> None:
+    # Empty rollup rows for users without one, skipping existing rows: a plain
+    # INSERT would collide with a concurrent checkout or rebuild creating it
+    table = models.CustomerMetrics.__table__
+    rows = [{"user_id": user_id, "total_spent": 0.0, "orders_count": 0, "ltv_score": 0, "tags": ",".join(compute_tags(0.0, 0))} for user_id in user_ids]
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        db.execute(mysql.insert(table).prefix_with("IGNORE"), rows)
+    elif dialect == "sqlite":
+        db.execute(sqlite.insert(table).on_conflict_do_nothing(), rows)
+    else:
+        existing = {row.user_id for row in db.query(models.CustomerMetrics.user_id).filter(models.CustomerMetrics.user_id.in_(user_ids))}
+        missing = [row for row in rows if row["user_id"] not in existing]
+        if missing:
+            db.execute(insert(table), missing)
+
+
+def record_order(db: Session, user_id: int, amount: float, created_at: datetime) -> None:
+    # Runs inside the caller's order transaction; the row lock serializes
+    # concurrent checkouts of the same customer so increments aren't lost.
+    _ensure_rows(db, [user_id])
+    metrics = db.query(models.CustomerMetrics).filter(
+        models.CustomerMetrics.user_id == user_id
+    ).with_for_update().populate_existing().one()
+    metrics.total_spent = (metrics.total_spent or 0) + amount
+    metrics.orders_count = (metrics.orders_count or 0) + 1
+    if metrics.first_order_at is None:
+        metrics.first_order_at = created_at
+    metrics.last_order_at = created_at
+    refresh_derived(metrics)
+
+
+def to_admin_user(user: models.User, metrics: models.CustomerMetrics | None) -> dict:
+    if metrics is None:
+        # Customers without a rollup row have never ordered
+        total_spent, orders_count = 0.0, 0
+        tags, ltv_score = compute_tags(0.0, 0), 0
+    else:
+        total_spent, orders_count = metrics.total_spent, metrics.orders_count
+        tags = metrics.tags.split(",") if metrics.tags else []
+        ltv_score = metrics.ltv_score
+    return {
+        "id": user.id,
+        "email": user.email,
+        "is_active": user.is_active == 1,
+        "is_admin": user.is_admin,
+        "created_at": user.created_at,
+        "last_login": user.last_login,
+        "phone": user.phone,
+        "address": user.address,
+        "total_spent": total_spent,
+        "orders_count": orders_count,
+        "ltv_score": ltv_score,
+        "tags": tags,
+    }
+
+
+def metrics_query(db: Session):
+    # One row per user with its rollup: O(1) work per listed user
+    query = db.query(models.User, models.CustomerMetrics).outerjoin(
+        models.CustomerMetrics, models.CustomerMetrics.user_id == models.User.id
+    )
+    total_spent = func.coalesce(models.CustomerMetrics.total_spent, 0)
+    orders_count = func.coalesce(models.CustomerMetrics.orders_count, 0)
+    return query, total_spent, orders_count
+
+
+def list_admin_users(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    tag: str | None = None,
+    min_ltv: int | None = None,
+    max_ltv: int | None = None,
+    sort_by: str | None = None,
+) -> tuple[list[dict], int]:
+    query, total_spent, orders_count = metrics_query(db)
+
+    if tag == "VIP":
+        query = query.filter(total_spent > VIP_MIN_SPENT)
+    elif tag == "Frecuente":
+        query = query.filter(orders_count >= FREQUENT_MIN_ORDERS)
+    elif tag == "Nuevo":
+        query = query.filter(orders_count == 0)
+    elif tag is not None:
+        raise HTTPException(status_code=400, detail=f"Unknown tag {tag}")
+
+    # LTV is a monotonic function of total_spent, so LTV bounds become spend bounds
+    if min_ltv is not None and min_ltv > 0:
+        query = query.filter(total_spent >= min_ltv * LTV_SPENT_PER_POINT)
+    if max_ltv is not None and max_ltv < 100:
+        query = query.filter(total_spent < (max_ltv + 1) * LTV_SPENT_PER_POINT)
+
+    total = query.count()
+
+    if sort_by == "spent_desc":
+        query = query.order_by(total_spent.desc(), models.User.id.desc())
+    elif sort_by == "spent_asc":
+        query = query.order_by(total_spent.asc(), models.User.id.asc())
+    elif sort_by == "orders_desc":
+        query = query.order_by(orders_count.desc(), models.User.id.desc())
+    elif sort_by == "orders_asc":
+        query = query.order_by(orders_count.asc(), models.User.id.asc())
+    elif sort_by == "newest":
+        query = query.order_by(models.User.id.desc())
+    elif sort_by == "email":
+        query = query.order_by(models.User.email.asc())
+    else:
+        # Oldest accounts first, as the listing always returned them
+        query = query.order_by(models.User.id.asc())
+
+    rows = query.offset(skip).limit(limit).all()
+    return [to_admin_user(user, metrics) for user, metrics in rows], total
+
+
+def get_admin_user(db: Session, user_id: int) -> dict | None:
+    query, _, _ = metrics_query(db)
+    row = query.filter(models.User.id == user_id).first()
+    if row is None:
+        return None
+    return to_admin_user(*row)
+
+
+def rebuild_customer_metrics(db: Session, batch_size: int = 1000, progress=None) -> int:
+    # Recompute every rollup row from the orders table, one batch of users per
+    # transaction. Rows are updated in place, never deleted: the listing keeps
+    # its numbers during a rebuild. Locking the batch's rows before reading the
+    # orders makes a concurrent checkout either finish first (its order is in
+    # the sums) or wait for the commit and add its increment afterwards.
+    # The batch's ids are read in a transaction of their own: under REPEATABLE
+    # READ the first plain SELECT fixes the snapshot, and it has to be the
+    # orders sum, taken once the locks are held. Otherwise a checkout that
+    # commits while the lock waits is in the row but not in the sums.
+    rebuilt = 0
+    last_user_id = 0
+    while True:
+        user_ids = [row.id for row in db.query(models.User.id).filter(
+            models.User.id > last_user_id
+        ).order_by(models.User.id).limit(batch_size)]
+        db.commit()
+        if not user_ids:
+            break
+        last_user_id = user_ids[-1]
+
+        _ensure_rows(db, user_ids)
+        rows = {metrics.user_id: metrics for metrics in db.query(models.CustomerMetrics).filter(
+            models.CustomerMetrics.user_id.in_(user_ids)
+        ).order_by(models.CustomerMetrics.user_id).with_for_update().populate_existing()}
+
+        totals = {row.user_id: row for row in db.query(
+            models.Order.user_id,
+            func.coalesce(func.sum(models.Order.total_amount), 0).label("total_spent"),
+            func.count(models.Order.id).label("orders_count"),
+            func.min(models.Order.created_at).label("first_order_at"),
+            func.max(models.Order.created_at).label("last_order_at"),
+        ).filter(models.Order.user_id.in_(user_ids)).group_by(models.Order.user_id)}
+
+        for user_id in user_ids:
+            row = totals.get(user_id)
+            metrics = rows[user_id]
+            metrics.total_spent = float(row.total_spent) if row else 0.0
+            metrics.orders_count = row.orders_count if row else 0
+            metrics.first_order_at = row.first_order_at if row else None
+            metrics.last_order_at = row.last_order_at if row else None
+            refresh_derived(metrics)
+        db.commit()
+        rebuilt += len(user_ids)
+        if progress:
+            progress(rebuilt)
+    return rebuilt
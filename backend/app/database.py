@@ -1,15 +1,119 @@
-from sqlalchemy import create_engine
+import itertools
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, exc
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 # XAMPP default settings: user='root', password='', host='localhost', port=3306
-SQLALCHEMY_DATABASE_URL = "mysql+pymysql://root:@localhost/ecommerce_db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "mysql+pymysql://root:@localhost/ecommerce_db")
+# Comma-separated read replicas; catalog reads and admin analytics are spread over them
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+# Connection pool (per engine, per process)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30")) # Seconds to wait for a free connection
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800")) # Below MySQL's wait_timeout, so idle connections never go stale
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+
+
+class PoolMetrics:
+    # Checkout wait times and timeouts of one pool
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def record(self, waited: float, timed_out: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            if timed_out:
+                self.timeouts += 1
+
+
+class InstrumentedQueuePool(QueuePool):
+    # QueuePool that times every checkout, including the wait for a free connection
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.metrics.record(time.perf_counter() - started, timed_out)
+
+    def stats(self) -> dict:
+        metrics = self.metrics
+        capacity = self.size() + self._max_overflow
+        checked_out = self.checkedout()
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": checked_out,
+            "idle": self.checkedin(),
+            "utilization": round(checked_out / capacity, 4) if capacity > 0 else None,
+            "checkouts": metrics.checkouts,
+            "wait_avg_ms": round(metrics.wait_total / metrics.checkouts * 1000, 3) if metrics.checkouts else 0.0,
+            "wait_max_ms": round(metrics.wait_max * 1000, 3),
+            "timeouts": metrics.timeouts,
+        }
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, async_engine: bool = False) -> dict:
+    if url.startswith("sqlite"):
+        if ":memory:" in url or url.split("://", 1)[1] in ("", "/"):
+            # In-memory SQLite keeps SQLAlchemy's default single-connection pool
+            return {"connect_args": {"check_same_thread": False}} if not async_engine else {}
+        # SQLite (local testing) connections are shared across the threadpool
+        options = {"connect_args": {"check_same_thread": False}} if not async_engine else {}
+    else:
+        options = {"connect_args": {"connect_timeout": CONNECT_TIMEOUT}}
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool if async_engine else InstrumentedQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=POOL_PRE_PING,
+    )
+    return options
+
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL
+    SQLALCHEMY_DATABASE_URL,
+    **engine_options(SQLALCHEMY_DATABASE_URL)
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read sessions rotate over the replicas, or use the primary when there are none.
+# Replicas lag: anything that must read its own writes stays on SessionLocal.
+read_engines = [create_engine(url, **engine_options(url)) for url in REPLICA_URLS] or [engine]
+_read_sessionmakers = itertools.cycle([
+    sessionmaker(autocommit=False, autoflush=False, bind=read_engine) for read_engine in read_engines
+])
+
+def read_session():
+    return next(_read_sessionmakers)()
+
 Base = declarative_base()
 
 # Dependency
@@ -19,3 +123,69 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async access path
+# With ASYNC_DB=1 the hot endpoints (product listing/detail, login, checkout) run
+# on an AsyncSession over an async driver, so waiting on the database releases
+# the event loop instead of pinning a threadpool worker.
+ASYNC_DB = os.getenv("ASYNC_DB", "0") == "1"
+
+# Sync driver -> async driver for the same database
+ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str) -> str:
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(SQLALCHEMY_DATABASE_URL)
+
+async_engine = None
+AsyncSessionLocal = None
+async_read_engines = []
+if ASYNC_DB:
+    # Imported only when enabled: needs aiomysql (or aiosqlite) installed
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, async_engine=True))
+    # expire_on_commit=False: attributes stay readable after commit without lazy IO
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    async_read_engines = [
+        create_async_engine(url, **engine_options(url, async_engine=True))
+        for url in map(to_async_url, REPLICA_URLS)
+    ] or [async_engine]
+    _async_read_sessionmakers = itertools.cycle([
+        async_sessionmaker(read_engine, autoflush=False, expire_on_commit=False) for read_engine in async_read_engines
+    ])
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with next(_async_read_sessionmakers)() as db:
+        yield db
+
+def pool_stats() -> dict:
+    # Checkout wait and utilization of every instrumented pool, keyed by role
+    engines = {"primary": engine}
+    if REPLICA_URLS:
+        engines.update({f"replica_{i}": read_engine for i, read_engine in enumerate(read_engines)})
+    if async_engine is not None:
+        engines["async_primary"] = async_engine.sync_engine
+        if REPLICA_URLS:
+            engines.update({f"async_replica_{i}": read_engine.sync_engine for i, read_engine in enumerate(async_read_engines)})
+    return {
+        name: {"url": bound.url.render_as_string(hide_password=True), **bound.pool.stats()}
+        for name, bound in engines.items() if isinstance(bound.pool, InstrumentedQueuePool)
+    }
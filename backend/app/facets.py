@@ -0,0 +1,241 @@
+import math
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from . import models
+
+# Facet Index
+# Counts for the listing's facets (category, price range, availability) come
+# from bitmaps instead of GROUP BY queries. Each bitmap is a Python int with
+# bit N set for product id N: one per category, one per price bucket, one for
+# in-stock products. A count is an AND of bitmaps and a bit_count().
+# Exact price filters use a price-sorted column (prices / ids arrays) for the
+# part of the range not covered by whole buckets.
+#
+# Writes don't touch the database again: catalog.invalidate() marks the
+# products it changed as dirty, and the next facet read reloads just those rows
+# in one query. Like the search index it lives in each process; changes made by
+# other processes are picked up by a full rebuild every FACET_REFRESH_SECONDS.
+
+FACET_REFRESH_SECONDS = float(os.getenv("FACET_REFRESH_SECONDS", "60"))
+FACET_MAX_DIRTY = 10_000 # More dirty products than this: rebuild instead
+# Upper bounds of the price buckets; the last bucket is open-ended
+PRICE_BUCKETS = tuple(float(edge) for edge in os.getenv("FACET_PRICE_BUCKETS", "10,25,50,100,250,500").split(","))
+NO_CATEGORY = -1
+
+
+def bits_from_ids(ids) -> int:
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for product_id in ids:
+        buffer[product_id >> 3] |= 1 << (product_id & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def bucket_of(price: float) -> int:
+    return bisect_right(PRICE_BUCKETS, price)
+
+
+class FacetIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = False
+        self._built_at = 0.0
+        self._dirty = set() # Product ids changed since the last sync
+        self._reset()
+
+    def _reset(self):
+        self._categories = [] # code -> name
+        self._category_codes = {} # name -> code
+        self._category_bits = [] # code -> bitmap
+        self._bucket_bits = [0] * (len(PRICE_BUCKETS) + 1)
+        self._in_stock = 0
+        self._all = 0
+        # Columns by product id, to find a product's old bits on update
+        self._category_of = array("i")
+        self._price_of = array("d")
+        # Price-sorted column for exact ranges
+        self._sorted_prices = array("d")
+        self._sorted_ids = array("i")
+
+    # Writes
+
+    def mark_dirty(self, product_ids=None) -> None:
+        # None: unknown changes (imports, jobs), rebuild on the next read
+        with self._lock:
+            if product_ids is None:
+                self._ready = False
+            else:
+                self._dirty.update(product_ids)
+
+    def sync(self, db) -> None:
+        # Called before reading: lazy build, periodic rebuild, then dirty rows
+        with self._lock:
+            stale = time.monotonic() - self._built_at > FACET_REFRESH_SECONDS
+            if not self._ready or stale or len(self._dirty) > FACET_MAX_DIRTY:
+                self._build(db)
+            elif self._dirty:
+                dirty, self._dirty = self._dirty, set()
+                rows = {row.id: row for row in self._query(db).filter(models.Product.id.in_(dirty))}
+                for product_id in dirty:
+                    self._remove(product_id)
+                    if product_id in rows:
+                        self._add(rows[product_id])
+
+    def _query(self, db):
+        return db.query(models.Product.id, models.Product.category, models.Product.price, models.Product.stock_quantity)
+
+    def _build(self, db) -> None:
+        self._reset()
+        self._dirty.clear()
+        rows = self._query(db).order_by(models.Product.id).all()
+        size = rows[-1].id // 8 + 1 if rows else 1
+        category_buffers, bucket_buffers = [], [bytearray(size) for _ in self._bucket_bits]
+        in_stock, everything = bytearray(size), bytearray(size)
+        priced = []
+        for row in rows:
+            byte, bit = row.id >> 3, 1 << (row.id & 7)
+            everything[byte] |= bit
+            code = self._code(row.category)
+            if code != NO_CATEGORY:
+                if code == len(category_buffers):
+                    category_buffers.append(bytearray(size))
+                category_buffers[code][byte] |= bit
+            if row.price is not None:
+                bucket_buffers[bucket_of(row.price)][byte] |= bit
+                priced.append((row.price, row.id))
+            if (row.stock_quantity or 0) > 0:
+                in_stock[byte] |= bit
+            self._set_columns(row.id, code, row.price)
+        self._category_bits = [int.from_bytes(buffer, "little") for buffer in category_buffers]
+        self._bucket_bits = [int.from_bytes(buffer, "little") for buffer in bucket_buffers]
+        self._in_stock = int.from_bytes(in_stock, "little")
+        self._all = int.from_bytes(everything, "little")
+        priced.sort()
+        self._sorted_prices = array("d", (price for price, _ in priced))
+        self._sorted_ids = array("i", (product_id for _, product_id in priced))
+        self._ready = True
+        self._built_at = time.monotonic()
+
+    def _code(self, category) -> int:
+        if not category:
+            return NO_CATEGORY
+        code = self._category_codes.get(category)
+        if code is None:
+            code = self._category_codes[category] = len(self._categories)
+            self._categories.append(category)
+            self._category_bits.append(0)
+        return code
+
+    def _set_columns(self, product_id: int, code: int, price) -> None:
+        missing = product_id + 1 - len(self._category_of)
+        if missing > 0:
+            self._category_of.extend([NO_CATEGORY] * missing)
+            self._price_of.extend([math.nan] * missing)
+        self._category_of[product_id] = code
+        self._price_of[product_id] = math.nan if price is None else price
+
+    def _remove(self, product_id: int) -> None:
+        mask = 1 << product_id
+        if not self._all & mask:
+            return
+        keep = ~mask
+        self._all &= keep
+        self._in_stock &= keep
+        code, price = self._category_of[product_id], self._price_of[product_id]
+        if code != NO_CATEGORY:
+            self._category_bits[code] &= keep
+        if not math.isnan(price):
+            self._bucket_bits[bucket_of(price)] &= keep
+            start = bisect_left(self._sorted_prices, price)
+            end = bisect_right(self._sorted_prices, price)
+            position = start + self._sorted_ids[start:end].index(product_id)
+            del self._sorted_prices[position]
+            del self._sorted_ids[position]
+        self._set_columns(product_id, NO_CATEGORY, None)
+
+    def _add(self, row) -> None:
+        mask = 1 << row.id
+        self._all |= mask
+        code = self._code(row.category)
+        if code != NO_CATEGORY:
+            self._category_bits[code] |= mask
+        if row.price is not None:
+            self._bucket_bits[bucket_of(row.price)] |= mask
+            position = bisect_right(self._sorted_prices, row.price)
+            self._sorted_prices.insert(position, row.price)
+            self._sorted_ids.insert(position, row.id)
+        if (row.stock_quantity or 0) > 0:
+            self._in_stock |= mask
+        self._set_columns(row.id, code, row.price)
+
+    # Reads
+
+    def _price_bits(self, min_price: float | None, max_price: float | None) -> int:
+        # Products with min_price <= price <= max_price (the listing's SQL filter)
+        low = -math.inf if min_price is None else min_price
+        high = math.inf if max_price is None else max_price
+        bits = 0
+        covered = [] # Buckets entirely inside the range: their bitmaps as they are
+        edges = (-math.inf,) + PRICE_BUCKETS + (math.inf,)
+        for bucket in range(len(self._bucket_bits)):
+            if edges[bucket] >= low and edges[bucket + 1] <= high:
+                covered.append(bucket)
+                bits |= self._bucket_bits[bucket]
+        # The rest of the range, from the sorted column
+        if covered:
+            ranges = [(low, edges[covered[0]], False), (edges[covered[-1] + 1], high, True)]
+        else:
+            ranges = [(low, high, True)]
+        ids = []
+        for start_price, end_price, inclusive in ranges:
+            start = bisect_left(self._sorted_prices, start_price)
+            end = (bisect_right if inclusive else bisect_left)(self._sorted_prices, end_price)
+            ids.extend(self._sorted_ids[start:end])
+        return bits | bits_from_ids(ids)
+
+    def counts(self, category=None, min_price=None, max_price=None, in_stock=None, product_ids=None) -> dict:
+        # Each facet counts the products matching every other filter, so
+        # selecting a category still shows how many there are in the others
+        with self._lock:
+            base = self._all if product_ids is None else self._all & bits_from_ids(product_ids)
+            filters = {
+                "category": self._category_bits[self._category_codes[category]] if category in self._category_codes
+                            else (0 if category else None),
+                "price": self._price_bits(min_price, max_price) if min_price is not None or max_price is not None else None,
+                "availability": self._in_stock if in_stock else None,
+            }
+
+            def matching(facet):
+                bits = base
+                for name, filter_bits in filters.items():
+                    if name != facet and filter_bits is not None:
+                        bits &= filter_bits
+                return bits
+
+            in_category = matching("category")
+            categories = [
+                {"value": name, "count": (self._category_bits[code] & in_category).bit_count()}
+                for code, name in enumerate(self._categories)
+            ]
+            in_price = matching("price")
+            edges = (0.0,) + PRICE_BUCKETS + (None,)
+            price_ranges = [
+                {"min": edges[bucket], "max": edges[bucket + 1], "count": (bits & in_price).bit_count()}
+                for bucket, bits in enumerate(self._bucket_bits)
+            ]
+            in_availability = matching("availability")
+            available = (in_availability & self._in_stock).bit_count()
+            return {
+                "categories": sorted((c for c in categories if c["count"]), key=lambda c: (-c["count"], c["value"])),
+                "price_ranges": price_ranges,
+                "availability": {"in_stock": available, "out_of_stock": in_availability.bit_count() - available},
+            }
+
+
+facet_index = FacetIndex()
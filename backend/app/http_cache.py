@@ -0,0 +1,73 @@
+import hashlib
+import os
+import re
+
+from fastapi import Request, Response
+
+from . import cache
+
+# HTTP Caching for Catalog Reads
+# Each catalog response is tagged with a weak ETag hashed from its own body, so
+# a tag only ever validates the resource it came from, whatever process served
+# it. A matching If-None-Match is answered with 304 once the route has returned
+# 200 (usually from catalog_cache), which saves the transfer and the client's
+# parse.
+# With a shared cache backend the tags are also remembered per URL under the
+# catalog and stock versions, which writes bump: a revalidation that matches the
+# remembered tag is answered before the route runs. A per-process backend
+# doesn't see other processes' writes, so there the route always runs.
+
+# Cache-Control per route; max-age for browsers, s-maxage for the CDN
+CACHE_RULES = [
+    (re.compile(r"^/products$"), os.getenv("HTTP_CACHE_PRODUCTS", "public, max-age=30, s-maxage=60, stale-while-revalidate=60")),
+    (re.compile(r"^/products/\d+$"), os.getenv("HTTP_CACHE_PRODUCT", "public, max-age=60, s-maxage=300, stale-while-revalidate=60")),
+    (re.compile(r"^/categories$"), os.getenv("HTTP_CACHE_CATEGORIES", "public, max-age=300, s-maxage=600")),
+]
+
+
+def cache_control_for(path: str) -> str | None:
+    for pattern, cache_control in CACHE_RULES:
+        if pattern.match(path):
+            return cache_control
+    return None
+
+
+def etag_for(body: bytes) -> str:
+    # Weak: the same body may be served gzipped or not
+    return f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: str, tag: str) -> bool:
+    # Weak comparison, as If-None-Match requires
+    opaque = tag.removeprefix("W/")
+    return any(candidate.strip() == "*" or candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+async def conditional_get(request: Request, call_next):
+    cache_control = cache_control_for(request.url.path) if request.method in ("GET", "HEAD") else None
+    if cache_control is None:
+        return await call_next(request)
+
+    if_none_match = request.headers.get("if-none-match")
+    # Keyed before the route runs: if a write lands meanwhile, the tag is stored
+    # under the older version, which nothing reads any more
+    remembered = None
+    if cache.catalog_cache.backend.shared:
+        remembered = cache.catalog_cache.key("etag", url=f"{request.url.path}?{request.url.query}", stock=cache.stock_cache.version())
+        tag = cache.catalog_cache.backend.get(remembered)
+        if tag is not None and if_none_match is not None and etag_matches(if_none_match, tag):
+            return Response(status_code=304, headers={"ETag": tag, "Cache-Control": cache_control})
+
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response # 404s and errors are neither tagged nor answered with 304
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    tag = etag_for(body)
+    if remembered is not None:
+        cache.catalog_cache.set(remembered, tag)
+    headers = {"ETag": tag, "Cache-Control": cache_control}
+    if if_none_match is not None and etag_matches(if_none_match, tag):
+        return Response(status_code=304, headers=headers)
+    response = Response(content=body, status_code=200, headers=dict(response.headers), media_type=response.media_type)
+    response.headers.update(headers)
+    return response
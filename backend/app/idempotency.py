@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+
+from . import models
+from .database import SessionLocal
+
+# Idempotency Keys
+# Clients retrying a POST (e.g. a checkout that timed out) send the same
+# Idempotency-Key header. The first request claims the key by inserting its
+# idempotency_keys row (the primary key makes that atomic across workers),
+# runs, and stores its response there for IDEMPOTENCY_TTL, in the request's own
+# transaction: the order and its stored response commit together or not at
+# all. Retries get that response back without running the transaction again. Duplicates that arrive
+# while the first one still runs poll until it finishes. Reusing a key with a
+# different body is a 422.
+# The claim holds for IDEMPOTENCY_LOCK_TTL and is refreshed while the request
+# runs, however slow its commit; it only lapses when the worker dies, and then
+# a duplicate takes over. Failed requests release the key (their transaction
+# was rolled back), so a retry runs again.
+
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400")) # Replays for a day
+IDEMPOTENCY_LOCK_TTL = int(os.getenv("IDEMPOTENCY_LOCK_TTL", "30")) # Claim of a worker that stopped refreshing it
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", "10")) # Max wait for the first request
+POLL_INTERVAL = 0.05
+PRUNE_INTERVAL = 300 # Seconds between deletes of expired keys (per process)
+MAX_KEY_LENGTH = 255
+
+_last_prune = 0.0
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class Claim:
+    def __init__(self, scope: str, user_id: int, key: str, payload: BaseModel):
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+        self.key = _digest(f"{scope}:{user_id}:{key}")
+        self.fingerprint = _digest(json.dumps(payload.model_dump(mode="json"), sort_keys=True, separators=(",", ":")))
+        self.deadline = time.monotonic() + IDEMPOTENCY_WAIT
+        self._stop = threading.Event()
+
+    def _rows(self, db):
+        return db.query(models.IdempotencyKey).filter(models.IdempotencyKey.key == self.key)
+
+    def attempt(self):
+        # True: this request owns the key. A dict: the stored response.
+        # None: another request with the key is still running.
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            db.add(models.IdempotencyKey(
+                key=self.key, fingerprint=self.fingerprint, response=None,
+                locked_until=now + timedelta(seconds=IDEMPOTENCY_LOCK_TTL),
+                expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL),
+            ))
+            try:
+                db.commit()
+                return True
+            except IntegrityError:
+                db.rollback()
+
+            record = self._rows(db).first()
+            if record is None:
+                return None # Released in between: claim it on the next attempt
+            if record.expires_at <= now:
+                self._rows(db).filter(models.IdempotencyKey.expires_at <= now).delete(synchronize_session=False)
+                db.commit()
+                return None
+            if record.fingerprint != self.fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+            if record.response is not None:
+                return record.response
+            if record.locked_until <= now:
+                # The worker that claimed it stopped: take over, unless another duplicate just did
+                taken = self._rows(db).filter(models.IdempotencyKey.locked_until <= now).update({"locked_until": now + timedelta(seconds=IDEMPOTENCY_LOCK_TTL)}, synchronize_session=False)
+                db.commit()
+                if taken:
+                    return True
+            if time.monotonic() > self.deadline:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+            return None
+        finally:
+            db.close()
+
+    def _update(self, **values) -> None:
+        db = SessionLocal()
+        try:
+            self._rows(db).update(values, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def hold(self) -> None:
+        # Refreshes the claim until complete() or release(), from a thread: it
+        # keeps going while the request's own thread or event loop is busy
+        def refresh():
+            while not self._stop.wait(IDEMPOTENCY_LOCK_TTL / 3):
+                self._update(locked_until=datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_LOCK_TTL))
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def complete(self, db, result, model: type[BaseModel]) -> None:
+        # In db, the request's session, right before it commits
+        self._stop.set()
+        data = model.model_validate(result, from_attributes=True).model_dump(mode="json")
+        self._rows(db).update({
+            "response": data, "locked_until": None,
+            "expires_at": datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_TTL),
+        }, synchronize_session=False)
+
+    def release(self) -> None:
+        self._stop.set()
+        db = SessionLocal()
+        try:
+            self._rows(db).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+def prune(now: datetime) -> None:
+    # Expired keys are deleted in bulk every PRUNE_INTERVAL, not one per request
+    global _last_prune
+    if time.monotonic() - _last_prune < PRUNE_INTERVAL:
+        return
+    _last_prune = time.monotonic()
+    db = SessionLocal()
+    try:
+        db.query(models.IdempotencyKey).filter(models.IdempotencyKey.expires_at <= now).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _replay(data: dict, response: Response | None) -> dict:
+    if response is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+    return data
+
+
+def run(db, scope: str, user_id: int, key: str | None, payload: BaseModel, model: type[BaseModel], execute, response: Response | None = None):
+    # execute(before_commit) runs the request once per key in db, the request's
+    # session, calling before_commit(session, result) (None without a key) just
+    # before its commit; model serializes its result
+    if key is None:
+        return execute(None)
+    claim = Claim(scope, user_id, key, payload)
+    while (outcome := claim.attempt()) is None:
+        time.sleep(POLL_INTERVAL)
+    if outcome is not True:
+        return _replay(outcome, response)
+    claim.hold()
+    try:
+        result = execute(lambda session, result: claim.complete(session, result, model))
+    except BaseException:
+        db.rollback() # Before the release, so it doesn't wait on the failed transaction's locks
+        claim.release()
+        raise
+    prune(datetime.utcnow())
+    return result
+
+
+async def run_async(db, scope: str, user_id: int, key: str | None, payload: BaseModel, model: type[BaseModel], execute, response: Response | None = None):
+    # run() for async routes: execute is a coroutine function; the key's
+    # database round trips and waits run in the threadpool, off the event loop
+    if key is None:
+        return await execute(None)
+    claim = Claim(scope, user_id, key, payload)
+
+    def wait_for_claim():
+        while (outcome := claim.attempt()) is None:
+            time.sleep(POLL_INTERVAL)
+        return outcome
+
+    outcome = await run_in_threadpool(wait_for_claim)
+    if outcome is not True:
+        return _replay(outcome, response)
+    claim.hold()
+    try:
+        result = await execute(lambda session, result: claim.complete(session, result, model))
+    except BaseException:
+        await db.rollback()
+        await run_in_threadpool(claim.release)
+        raise
+    await run_in_threadpool(prune, datetime.utcnow())
+    return result
@@ -0,0 +1,219 @@
+import io
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from . import storage
+
+try:
+    from PIL import Image, ImageOps # Optional dependency: without it originals are served as-is
+except ImportError:
+    Image = None
+
+IMAGE_ERRORS = (Image.DecompressionBombError, OSError) if Image else (OSError,) # Corrupt / oversized sources
+
+# Image Derivatives
+# /images/{key}?w=320&format=webp serves a resized / re-encoded copy of an
+# uploaded image. Each variant is generated once, kept in IMAGE_CACHE_DIR and
+# evicted least-recently-used past IMAGE_CACHE_MAX_BYTES. Source keys are
+# content hashes, so a variant never changes: clients may cache it forever.
+
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "image_cache")
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+# Variants generated right after an upload, e.g. "320:webp,640:webp"; empty = on first request only
+IMAGE_EAGER_VARIANTS = os.getenv("IMAGE_EAGER_VARIANTS", "")
+# Requested widths snap up to one of these, so query strings can't fill the cache
+WIDTHS = (64, 128, 256, 320, 480, 640, 800, 1024, 1280, 1600, 2048)
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+}
+QUALITY = 80
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]+\.[A-Za-z0-9]+$") # Plain file names only, no paths
+
+
+def snap_width(width: int) -> int:
+    for allowed in WIDTHS:
+        if width <= allowed:
+            return allowed
+    return WIDTHS[-1]
+
+
+def etag(key: str, width: int | None, fmt: str | None) -> str:
+    stem = key.rsplit(".", 1)[0]
+    return f'"{stem}-w{width or 0}-{fmt or "orig"}"'
+
+
+class DerivativeCache:
+    # Files on disk, LRU by mtime (touched on every hit)
+
+    def __init__(self, directory: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._key_locks = {} # variant name -> lock, so one request generates and the rest wait
+        self._size = None # Bytes on disk, scanned on first use
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def get(self, name: str) -> str | None:
+        path = self.path(name)
+        try:
+            os.utime(path) # Mark as recently used
+        except FileNotFoundError:
+            return None
+        return path
+
+    def lock_for(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(name, threading.Lock())
+
+    def release_lock(self, name: str) -> None:
+        # Once the variant is stored or failed; requests waiting on it keep their reference
+        with self._lock:
+            self._key_locks.pop(name, None)
+
+    def put(self, name: str, data: bytes) -> str:
+        # Temp file + rename: readers never see a partial file
+        with tempfile.NamedTemporaryFile(dir=self.directory, delete=False, suffix=".tmp") as temp:
+            temp.write(data)
+        os.replace(temp.name, self.path(name))
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict(keep=name)
+        return self.path(name)
+
+    def _entries(self):
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                yield entry
+
+    def _scan(self) -> int:
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _evict(self, keep: str) -> None:
+        # Oldest first, down to 90% of the budget so eviction doesn't run on every put.
+        # keep (the file just written) survives: its caller is about to serve it.
+        entries = sorted(
+            (entry for entry in self._entries() if entry.name != keep), key=lambda entry: entry.stat().st_mtime
+        )
+        target = self.max_bytes * 0.9
+        for entry in entries:
+            if self._size <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._size -= size
+            except FileNotFoundError:
+                pass
+
+
+derivative_cache = DerivativeCache()
+_eager_pool = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="images")
+
+
+def render(source, width: int, fmt: str) -> bytes:
+    # Resize to width (never upscaling) and encode as fmt
+    pil_format, _ = FORMATS[fmt]
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image) # Phone photos carry their rotation in EXIF
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert("RGBA")
+        output = io.BytesIO()
+        image.save(output, pil_format, quality=QUALITY, optimize=pil_format != "WEBP")
+        return output.getvalue()
+
+
+def get_variant(key: str, width: int, fmt: str) -> str:
+    # Blocking: path of the cached variant, generating it on first use
+    name = f"{key.rsplit('.', 1)[0]}_w{width}.{fmt}"
+    path = derivative_cache.get(name)
+    if path:
+        return path
+    with derivative_cache.lock_for(name):
+        path = derivative_cache.get(name) # Generated while we waited
+        if path:
+            return path
+        try:
+            with storage.storage.open(key) as source:
+                data = render(io.BytesIO(source.read()), width, fmt)
+            return derivative_cache.put(name, data)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Image not found")
+        except IMAGE_ERRORS as e:
+            raise HTTPException(status_code=400, detail=f"Cannot process image: {e}")
+        finally:
+            derivative_cache.release_lock(name)
+
+
+def parse_variant(key: str, w: int | None, fmt: str | None) -> tuple[int | None, str | None]:
+    if not KEY_PATTERN.match(key):
+        raise HTTPException(status_code=404, detail="Image not found")
+    if fmt is not None and fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    if w is not None and w <= 0:
+        raise HTTPException(status_code=400, detail="w must be positive")
+    if Image is None or (w is None and fmt is None):
+        return None, None # Original bytes
+    source_fmt = storage.EXTENSION_ALIASES.get(key.rsplit(".", 1)[-1].lower(), key.rsplit(".", 1)[-1].lower())
+    return snap_width(w or WIDTHS[-1]), fmt or (source_fmt if source_fmt in FORMATS else "webp")
+
+
+def not_modified(if_none_match: str | None, tag: str) -> bool:
+    if not if_none_match:
+        return False
+    return any(candidate.strip().removeprefix("W/") in (tag, "*") for candidate in if_none_match.split(","))
+
+
+def read_original(key: str) -> tuple[bytes, str]:
+    # Blocking: the stored bytes and their content type
+    extension = key.rsplit(".", 1)[-1].lower()
+    try:
+        with storage.storage.open(key) as source:
+            data = source.read()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return data, storage.CONTENT_TYPES.get(extension, "application/octet-stream")
+
+
+def eager_variants() -> list[tuple[int, str]]:
+    variants = []
+    for item in filter(None, (part.strip() for part in IMAGE_EAGER_VARIANTS.split(","))):
+        width, _, fmt = item.partition(":")
+        variants.append((snap_width(int(width)), fmt or "webp"))
+    return variants
+
+
+def generate_eagerly(url: str) -> None:
+    # After an upload: pre-render the configured variants in the image pool
+    if Image is None:
+        return
+    key = url.rsplit("/", 1)[-1]
+    for width, fmt in eager_variants():
+        _eager_pool.submit(_generate_quietly, key, width, fmt)
+
+
+def _generate_quietly(key: str, width: int, fmt: str) -> None:
+    try:
+        get_variant(key, width, fmt)
+    except HTTPException:
+        pass # Same error will surface when the variant is requested
@@ -0,0 +1,74 @@
+from fastapi import HTTPException
+from sqlalchemy import and_, case, func, insert, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Inventory Reservation
+# Stock only changes through single UPDATE statements evaluated by the database,
+# never read-modify-write in Python, so concurrent requests can't lose updates.
+
+
+def reserve_stock(db: Session, quantities: dict[int, int]) -> None:
+    # Rows are updated in ascending id order: every checkout takes row locks in
+    # the same order, so two orders sharing products can't deadlock each other.
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        result = db.execute(
+            update(models.Product)
+            .where(models.Product.id == product_id, models.Product.stock_quantity >= quantity)
+            .values(stock_quantity=models.Product.stock_quantity - quantity)
+        )
+        if result.rowcount != 1:
+            raise HTTPException(status_code=409, detail=f"Insufficient stock for product {product_id}")
+
+
+def apply_stock_delta(db: Session, product_id: int, delta: int) -> None:
+    db.execute(
+        update(models.Product)
+        .where(models.Product.id == product_id)
+        .values(stock_quantity=models.Product.stock_quantity + delta)
+    )
+
+
+def record_order_movements(db: Session, order_id: int, quantities: dict[int, int]) -> None:
+    db.execute(insert(models.StockMovement), [
+        {
+            "product_id": product_id,
+            "quantity": quantity,
+            "movement_type": "OUT",
+            "reason": f"Order #{order_id}",
+        }
+        for product_id, quantity in sorted(quantities.items())
+    ])
+
+
+# Inventory Dashboard
+
+def dashboard_stats(db: Session) -> dict:
+    # One aggregate query instead of loading every Product into Python
+    stock = func.coalesce(models.Product.stock_quantity, 0)
+    min_stock = func.coalesce(models.Product.min_stock, 0)
+    cost = func.coalesce(models.Product.cost_price, 0)
+    row = db.query(
+        func.count(models.Product.id).label("total_sku"),
+        func.coalesce(func.sum(stock * cost), 0).label("total_valuation"),
+        func.coalesce(func.sum(case((and_(stock <= min_stock, stock > 0), 1), else_=0)), 0).label("low_stock_count"),
+        func.coalesce(func.sum(case((stock == 0, 1), else_=0)), 0).label("out_of_stock_count"),
+    ).one()
+    return {
+        "total_valuation": float(row.total_valuation),
+        "low_stock_count": int(row.low_stock_count),
+        "out_of_stock_count": int(row.out_of_stock_count),
+        "total_sku": int(row.total_sku),
+    }
+
+
+def low_stock_query(db: Session, include_out_of_stock: bool = False):
+    # Read in ix_products_stock_id order (stock_quantity, id): no sort, and
+    # stock_quantity > 0 is a range of it. stock_quantity <= min_stock compares
+    # two columns, which no index can seek: it is checked on each row read.
+    query = db.query(models.Product).filter(models.Product.stock_quantity <= models.Product.min_stock)
+    if not include_out_of_stock:
+        query = query.filter(models.Product.stock_quantity > 0)
+    return query.order_by(models.Product.stock_quantity.asc(), models.Product.id.asc())
@@ -0,0 +1,232 @@
+import codecs
+import functools
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from . import models, search, catalog, product_import, customer_metrics, analytics
+from .database import SessionLocal
+
+# Background Jobs
+# Heavy admin operations run in a worker process pool instead of an API worker.
+# The jobs table is the source of truth: submit() inserts a queued row, the
+# worker claims it (queued -> running, so a job runs once even if dispatched
+# twice), sends heartbeats, reports progress and stores the result or error.
+# Anything the API process keeps in memory (search index, catalog cache) is
+# refreshed by a done-callback back in the API process.
+# The pool dies with the API process: recover_jobs() at startup dispatches the
+# queued rows again and fails "running" rows whose heartbeat stopped.
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_EXECUTOR = os.getenv("JOB_EXECUTOR", "process") # process, thread (dev: in-memory SQLite)
+JOBS_DIR = os.getenv("JOBS_DIR", "jobs") # Uploaded files waiting for their job; must be shared with the workers
+PROGRESS_INTERVAL = 1.0 # Seconds between progress writes
+HEARTBEAT_INTERVAL = 15 # Seconds between updated_at writes of a running job
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "120")) # Running without a heartbeat this long: worker is gone
+os.makedirs(JOBS_DIR, exist_ok=True)
+
+
+# Job handlers: run inside the worker, (db, params, progress) -> result dict
+
+def _import_products(db: Session, params: dict, progress) -> dict:
+    path = params["path"]
+    try:
+        with open(path, "rb") as file:
+            return product_import.import_products(
+                db, codecs.iterdecode(file, "utf-8-sig"), mode=params.get("mode", "create"), progress=progress
+            )
+    finally:
+        os.remove(path)
+
+
+def _rebuild_customer_metrics(db: Session, params: dict, progress) -> dict:
+    return {"users": customer_metrics.rebuild_customer_metrics(db, progress=progress)}
+
+
+def _rebuild_sales_rollups(db: Session, params: dict, progress) -> dict:
+    start = date.fromisoformat(params["start"]) if params.get("start") else None
+    end = date.fromisoformat(params["end"]) if params.get("end") else None
+    return {"days": analytics.rebuild_sales_rollups(db, start, end, progress=progress)}
+
+
+JOB_HANDLERS = {
+    "import_products": _import_products,
+    "rebuild_customer_metrics": _rebuild_customer_metrics,
+    "rebuild_sales_rollups": _rebuild_sales_rollups,
+}
+SUBMITTABLE_KINDS = ("rebuild_customer_metrics", "rebuild_sales_rollups") # import_products comes from /products/bulk
+
+
+def _update_job(job_id: int, **values) -> None:
+    # Own short session: never mixes with the handler's transaction
+    db = SessionLocal()
+    try:
+        db.query(models.Job).filter(models.Job.id == job_id).update(
+            {**values, "updated_at": datetime.utcnow()}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _claim(job_id: int) -> bool:
+    # queued -> running in one UPDATE: only one worker gets the row
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        claimed = db.query(models.Job).filter(models.Job.id == job_id, models.Job.status == "queued").update(
+            {"status": "running", "started_at": now, "updated_at": now}, synchronize_session=False
+        )
+        db.commit()
+        return claimed == 1
+    finally:
+        db.close()
+
+
+def _heartbeat(job_id: int, stop: threading.Event) -> None:
+    # Keeps updated_at fresh between progress reports, so recover_jobs() can tell a slow job from a dead one
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        _update_job(job_id)
+
+
+def run_job(job_id: int) -> tuple[str, str, dict] | None:
+    # Entry point in the worker. Returns (kind, status, params) for the done-callback,
+    # None when the job was already claimed by another worker.
+    if not _claim(job_id):
+        return None
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, stop), daemon=True).start()
+    db = SessionLocal()
+    try:
+        job = db.query(models.Job).filter(models.Job.id == job_id).first()
+        kind, params = job.kind, dict(job.params or {})
+
+        last_report, last_done = 0.0, 0
+        def progress(done: int) -> None:
+            nonlocal last_report, last_done
+            last_done = done
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                _update_job(job_id, progress=done)
+
+        try:
+            result = JOB_HANDLERS[kind](db, params, progress)
+        except Exception as e:
+            db.rollback()
+            error = e.detail if isinstance(e, HTTPException) else f"{e.__class__.__name__}: {e}"
+            _update_job(job_id, status="failed", error=str(error), progress=last_done, finished_at=datetime.utcnow())
+            return kind, "failed", params
+        _update_job(job_id, status="succeeded", result=result, progress=last_done, finished_at=datetime.utcnow())
+        return kind, "succeeded", params
+    finally:
+        stop.set()
+        db.close()
+
+
+_executor = None
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        if JOB_EXECUTOR == "thread":
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        else:
+            # spawn: workers start clean instead of inheriting the API's engine and threads
+            _executor = ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def _on_done(job_id: int, future) -> None:
+    # Back in the API process: refresh what it holds in memory
+    try:
+        outcome = future.result()
+    except Exception as e:
+        # The worker process died (or the pool was shut down) before the job could record it
+        _update_job(job_id, status="failed", error=f"Worker stopped: {e.__class__.__name__}", finished_at=datetime.utcnow())
+        return
+    if outcome is None:
+        return
+    kind, status, params = outcome
+    if kind == "import_products":
+        # Even a failed import may have committed some chunks
+        db = SessionLocal()
+        try:
+            # Imported products all got ids above the highest one at submit time
+            rows = db.query(
+                models.Product.id, models.Product.name, models.Product.description,
+                models.Product.category, models.Product.sku,
+            ).filter(models.Product.id > params.get("after_id", 0)).yield_per(1000)
+            search_engine = search.get_search_engine()
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == 1000:
+                    search_engine.index_products(batch)
+                    batch = []
+            search_engine.index_products(batch)
+        finally:
+            db.close()
+        catalog.invalidate()
+
+
+def submit(db: Session, kind: str, params: dict, user_id: int | None = None) -> models.Job:
+    if kind not in JOB_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind {kind}")
+    job = models.Job(kind=kind, status="queued", params=params, progress=0, created_by=user_id)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    _dispatch(job.id)
+    return job
+
+
+def _dispatch(job_id: int) -> None:
+    get_executor().submit(run_job, job_id).add_done_callback(functools.partial(_on_done, job_id))
+
+
+def recover_jobs() -> None:
+    # At startup: jobs the previous API process had queued or running in its pool
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        db.query(models.Job).filter(
+            models.Job.status == "running",
+            models.Job.updated_at < now - timedelta(seconds=JOB_STALE_SECONDS),
+        ).update({
+            "status": "failed", "error": "Worker stopped before the job finished", "finished_at": now, "updated_at": now,
+        }, synchronize_session=False)
+        db.commit()
+        queued = [row.id for row in db.query(models.Job.id).filter(models.Job.status == "queued").order_by(models.Job.id)]
+    finally:
+        db.close()
+    for job_id in queued:
+        _dispatch(job_id) # Claimed once even if another API process dispatches it too
+
+
+def submit_import(db: Session, upload, mode: str, user_id: int | None = None) -> models.Job:
+    # The upload is copied to JOBS_DIR so the worker can read it after this request ends
+    if mode not in product_import.IMPORT_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(product_import.IMPORT_MODES)}")
+    path = os.path.join(JOBS_DIR, f"import-{uuid.uuid4().hex}.csv")
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(upload, buffer)
+    after_id = db.query(models.Product.id).order_by(models.Product.id.desc()).limit(1).scalar() or 0
+    return submit(db, "import_products", {"path": path, "mode": mode, "after_id": after_id}, user_id)
+
+
+def list_jobs(db: Session, status: str | None = None, kind: str | None = None, skip: int = 0, limit: int = 50):
+    query = db.query(models.Job)
+    if status:
+        query = query.filter(models.Job.status == status)
+    if kind:
+        query = query.filter(models.Job.kind == kind)
+    return query.order_by(models.Job.id.desc()).offset(skip).limit(limit).all()
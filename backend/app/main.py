@@ -1,20 +1,40 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Request, Response, Header, Query
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-import shutil
-import uuid
+import codecs
 import os
+from contextlib import asynccontextmanager
+from datetime import date
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from typing import List
 from pydantic import BaseModel
 
-from . import models, schemas
-from .database import SessionLocal, engine
+from . import models, schemas, search, cache, customer_metrics, inventory, analytics, catalog, orders, users, product_import, jobs, storage, images, http_cache, responses, metrics, database, idempotency, pagination, migrations
+from .database import SessionLocal, engine, read_session
 
-# Create tables
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The schema comes from the versioned migrations alone (python migrate.py)
+    pending = migrations.pending(engine)
+    if pending:
+        names = ", ".join(f"{migration.version:04d}_{migration.name}" for migration in pending)
+        raise RuntimeError(f"Pending schema migrations: {names}. Run python migrate.py first")
+    # At startup, not import: job worker processes import this module too
+    jobs.recover_jobs() # Jobs left queued or running by a previous process
+    yield
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+if database.ASYNC_DB:
+    # Registered first, so these async handlers take over the hot routes below
+    from . import async_api
+    app.include_router(async_api.router)
+
+# ETag / Cache-Control on catalog reads, 304 for revalidations.
+# Added before CORS so 304s get CORS headers too.
+app.middleware("http")(http_cache.conditional_get)
 
 # Configure CORS
 app.add_middleware(
@@ -25,24 +45,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Ensure uploads directory exists
-UPLOAD_DIR = "uploads"
+# gzip / brotli for responses over COMPRESSION_MIN_SIZE
+app.add_middleware(responses.CompressionMiddleware)
+
+# Outermost: latency and SQL statements per route, for /metrics
+app.middleware("http")(metrics.instrument)
+
+# Local uploads are served from here (STORAGE_BACKEND=local)
+UPLOAD_DIR = storage.UPLOAD_DIR
+UPLOAD_FORM_OVERHEAD = 64 * 1024 # Multipart boundaries and headers around the file
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory=UPLOAD_DIR), name="static")
 
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # Refuse oversized uploads from Content-Length, before the body is received;
+    # store_upload enforces the limit on the bytes themselves
+    if request.url.path == "/upload":
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > storage.UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD:
+            return JSONResponse(status_code=413, content={"detail": f"File larger than {storage.UPLOAD_MAX_BYTES} bytes"})
+    return await call_next(request)
+
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
-    # Generate unique filename
-    file_extension = file.filename.split(".")[-1]
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = f"{UPLOAD_DIR}/{unique_filename}"
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    return {"url": f"http://localhost:8000/static/{unique_filename}"}
+    # Hashing and writing run in the threadpool: the event loop only awaits
+    url = await run_in_threadpool(storage.store_upload, file.file, file.filename, file.size)
+    images.generate_eagerly(url)
+    return {"url": url}
+
+@app.get("/images/{key}")
+def read_image(key: str, request: Request, w: int | None = None, format: str | None = None):
+    # Resized / re-encoded variants of uploads, e.g. /images/<key>?w=320&format=webp
+    width, fmt = images.parse_variant(key, w, format)
+    tag = images.etag(key, width, fmt)
+    headers = {"ETag": tag, "Cache-Control": images.CACHE_CONTROL}
+    if images.not_modified(request.headers.get("if-none-match"), tag):
+        # Tags are derived from the key alone: a 304 only for an image that exists
+        if not storage.storage.exists(key):
+            raise HTTPException(status_code=404, detail="Image not found")
+        return Response(status_code=304, headers=headers)
+    if width is None:
+        data, media_type = images.read_original(key)
+        return Response(content=data, media_type=media_type, headers=headers)
+    return FileResponse(images.get_variant(key, width, fmt), media_type=images.FORMATS[fmt][1], headers=headers)
 
 # Dependency
 def get_db():
@@ -52,178 +100,118 @@ def get_db():
     finally:
         db.close()
 
+# Read-only routes: a replica when DATABASE_REPLICA_URLS is set, else the primary.
+# Catalog cache entries filled from a lagging replica live at most CACHE_TTL.
+def get_read_db():
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
 @app.get("/")
 def read_root():
     return {"message": "Ecommerce API is running"}
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics(request: Request):
+    # Prometheus scrape endpoint
+    if metrics.METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {metrics.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/products", response_model=schemas.PaginatedProductResponse)
 def read_products(
-    skip: int = 0, 
-    limit: int = 100, 
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=pagination.MAX_PAGE_SIZE),
     q: str | None = None,
     category: str | None = None,
     min_price: float | None = None,
     max_price: float | None = None,
     in_stock: bool | None = None,
     sort_by: str | None = None, # price_asc, price_desc, newest
-    db: Session = Depends(get_db)
+    cursor: str | None = None, # next_cursor from the previous page (replaces skip)
+    include_total: bool = True,
+    fields: str | None = None, # Sparse items, e.g. id,name,price,image_url
+    facets: bool = False, # Add category / price range / availability counts
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(models.Product)
-    
-    if q:
-        search_filter = f"%{q}%"
-        query = query.filter(
-            (models.Product.name.like(search_filter)) | 
-            (models.Product.description.like(search_filter))
-        )
-    
-    if category:
-        query = query.filter(models.Product.category == category)
-
-    if min_price is not None:
-        query = query.filter(models.Product.price >= min_price)
-    
-    if max_price is not None:
-        query = query.filter(models.Product.price <= max_price)
-
-    if in_stock:
-        query = query.filter(models.Product.stock_quantity > 0)
-    
-    # Sorting
-    if sort_by == "price_asc":
-        query = query.order_by(models.Product.price.asc())
-    elif sort_by == "price_desc":
-        query = query.order_by(models.Product.price.desc())
-    elif sort_by == "newest":
-        query = query.order_by(models.Product.id.desc()) # ID as proxy for creation time
-    else:
-        # Default relevance (if search) or newest
-        query = query.order_by(models.Product.id.desc())
-    
-    total = query.count()
-    products = query.offset(skip).limit(limit).all()
-    
-    return {"items": products, "total": total}
+    page = catalog.list_products(
+        db, skip=skip, limit=limit, q=q, category=category, min_price=min_price,
+        max_price=max_price, in_stock=in_stock, sort_by=sort_by, cursor=cursor,
+        include_total=include_total, with_facets=facets,
+    )
+    return responses.product_page(page, fields)
 
 @app.get("/products/{product_id}", response_model=schemas.Product)
-def read_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
-    if product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-    if product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+def read_product(product_id: int, db: Session = Depends(get_read_db)):
+    return catalog.get_product(db, product_id)
 
 @app.get("/categories", response_model=List[str])
-def read_categories(db: Session = Depends(get_db)):
-    # Efficiently get distinct categories
-    categories = db.query(models.Product.category).distinct().all()
-    # categories is a list of tuples [('Ropa',), ('Hogar',)], flatten it
-    return [c[0] for c in categories if c[0]]
+def read_categories(db: Session = Depends(get_read_db)):
+    return catalog.list_categories(db)
+
+invalidate_catalog = catalog.invalidate
 
 # Security & Auth
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.security import OAuth2PasswordRequestForm
 from . import auth
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+oauth2_scheme = auth.oauth2_scheme
 
 @app.post("/users", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_user:
+async def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    if await run_in_threadpool(users.get_user_by_email, db, user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = auth.get_password_hash(user.password)
-    db_user = models.User(email=user.email, hashed_password=hashed_password)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    hashed_password = await auth.hash_password(user.password)
+    return await run_in_threadpool(users.create_user, db, user.email, hashed_password)
 
 @app.post("/token", response_model=schemas.Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(
-            status_code=401,
-            detail="Incorrect username or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    access_token_expires = auth.timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = auth.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    def run_db(fn, *args):
+        return run_in_threadpool(fn, db, *args)
+    user = await users.authenticate(run_db, form_data.username, form_data.password)
+    return auth.create_user_token(user)
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = auth.jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(email=email)
-    except auth.JWTError:
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
+    claims = auth.decode_access_token(token)
+    if claims is None:
+        raise auth.credentials_exception()
+    # Cached by user id: most requests authenticate without touching the database
+    user = auth.user_cache.get(claims.get("uid"))
     if user is None:
-        raise credentials_exception
-    return user
+        user = await run_in_threadpool(users.load_user, db, claims)
+    return users.check_active(user)
 
 @app.get("/users/me", response_model=schemas.User)
 async def read_users_me(current_user: schemas.User = Depends(get_current_user)):
     return current_user
 
 @app.post("/orders", response_model=schemas.OrderResponse)
-def create_order(order: schemas.OrderCreate, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    # 1. Validate items and calculate total server-side
-    total_amount = 0
-    order_items_data = []
-
-    for item in order.items:
-        product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
-        
-        total_amount += product.price * item.quantity
-        order_items_data.append({
-            "product_id": item.product_id,
-            "quantity": item.quantity,
-            "price": product.price
-        })
-
-    # 2. Create Order
-    db_order = models.Order(
-        user_id=current_user.id,
-        total_amount=total_amount,
-        status="completed" # MVP: Auto-complete for now
+def create_order(
+    order: schemas.OrderCreate,
+    response: Response,
+    idempotency_key: str | None = Header(None), # Retries with the same key return the first order
+    current_user: schemas.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return idempotency.run(
+        db, "orders", current_user.id, idempotency_key, order, schemas.OrderResponse,
+        lambda before_commit: orders.place_order(db, current_user.id, order, before_commit), response,
     )
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
-
-    # 3. Create OrderItems
-    for item_data in order_items_data:
-        db_item = models.OrderItem(
-            order_id=db_order.id,
-            product_id=item_data["product_id"],
-            quantity=item_data["quantity"],
-            price=item_data["price"]
-        )
-        db.add(db_item)
-    
-    db.commit()
-    db.refresh(db_order)
-    return db_order
 
 @app.get("/orders", response_model=List[schemas.OrderResponse])
-def read_orders(current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    orders = db.query(models.Order).filter(models.Order.user_id == current_user.id).order_by(models.Order.created_at.desc()).all()
-    return orders
+def read_orders(
+    response: Response,
+    skip: int = 0,
+    limit: int = 50,
+    current_user: schemas.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    user_orders, total = orders.list_user_orders(db, current_user.id, skip=skip, limit=limit)
+    response.headers["X-Total-Count"] = str(total)
+    return user_orders
 
 # Admin Endpoints
 def get_current_admin(current_user: schemas.User = Depends(get_current_user)):
@@ -237,46 +225,29 @@ def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
+    search.get_search_engine().index_product(db_product)
+    invalidate_catalog([db_product.id])
     return db_product
 
 @app.post("/products/bulk")
-async def bulk_create_products(file: UploadFile = File(...), db: Session = Depends(get_db), admin: schemas.User = Depends(get_current_admin)):
-    import csv
-    import codecs
-    
-    csvReader = csv.DictReader(codecs.iterdecode(file.file, 'utf-8'))
-    created_count = 0
-    errors = []
-    
-    for row in csvReader:
-        try:
-            # Basic validation
-            if not row.get('name') or not row.get('price'):
-                continue
-                
-            # Check SKU existence
-            sku = row.get('sku')
-            if sku and db.query(models.Product).filter(models.Product.sku == sku).first():
-                errors.append(f"SKU {sku} already exists")
-                continue
-                
-            product = models.Product(
-                name=row['name'],
-                description=row.get('description', ''),
-                price=float(row['price']),
-                stock_quantity=int(row.get('stock', 0)),
-                min_stock=int(row.get('min_stock', 5)),
-                category=row.get('category', 'General'),
-                sku=sku,
-                image_url=row.get('image_url', '')
-            )
-            db.add(product)
-            created_count += 1
-        except Exception as e:
-            errors.append(f"Row error: {str(e)}")
-            
-    db.commit()
-    return {"created": created_count, "errors": errors}
+def bulk_create_products(
+    file: UploadFile = File(...),
+    mode: str = "create", # create, upsert (update price/stock of existing SKUs)
+    background: bool = False, # Return a job id right away; poll /admin/jobs/{id}
+    db: Session = Depends(get_db),
+    admin: schemas.User = Depends(get_current_admin)
+):
+    if background:
+        job = jobs.submit_import(db, file.file, mode, user_id=admin.id)
+        return {"job_id": job.id, "status": job.status}
+
+    # Sync handler: the streaming import runs in the threadpool, never on the event loop
+    # Decoded line by line, so a bad byte is reported at its row
+    lines = codecs.iterdecode(file.file, "utf-8-sig")
+    try:
+        return product_import.import_products(db, lines, mode=mode)
+    finally:
+        invalidate_catalog()
 
 @app.put("/products/{product_id}", response_model=schemas.Product)
 def update_product(product_id: int, product: schemas.ProductCreate, db: Session = Depends(get_db), admin: schemas.User = Depends(get_current_admin)):
@@ -289,6 +260,8 @@ def update_product(product_id: int, product: schemas.ProductCreate, db: Session
     
     db.commit()
     db.refresh(db_product)
+    search.get_search_engine().index_product(db_product)
+    invalidate_catalog([db_product.id])
     return db_product
 
     db.delete(db_product)
@@ -296,93 +269,94 @@ def update_product(product_id: int, product: schemas.ProductCreate, db: Session
     return {"message": "Product deleted"}
 
 @app.get("/admin/users", response_model=List[schemas.AdminUserResponse])
-def read_admin_users(db: Session = Depends(get_db), admin: schemas.User = Depends(get_current_admin)):
-    users = db.query(models.User).all()
-    response = []
-    for user in users:
-        # Calculate metrics from orders
-        orders = db.query(models.Order).filter(models.Order.user_id == user.id).all()
-        total_spent = sum((order.total_amount or 0) for order in orders)
-        orders_count = len(orders)
-        
-        # Simple Logic for Tags and LTV
-        tags = []
-        if total_spent > 100000:
-            tags.append("VIP")
-        if orders_count > 5:
-            tags.append("Frecuente")
-        if not orders:
-            tags.append("Nuevo")
-            
-        ltv_score = min(int((total_spent / 500000) * 100), 100) # Simple normalization
-        
-        response.append({
-            "id": user.id,
-            "email": user.email,
-            "is_active": user.is_active == 1,
-            "is_admin": user.is_admin,
-            "created_at": user.created_at,
-            "last_login": user.last_login,
-            "phone": user.phone,
-            "address": user.address,
-            "total_spent": total_spent,
-            "orders_count": orders_count,
-            "ltv_score": ltv_score,
-            "tags": tags
-        })
-    return response
+def read_admin_users(
+    skip: int = 0,
+    limit: int = 100,
+    tag: str | None = None, # VIP, Frecuente, Nuevo
+    min_ltv: int | None = None,
+    max_ltv: int | None = None,
+    sort_by: str | None = None, # spent_desc, spent_asc, orders_desc, orders_asc, newest, email
+    fields: str | None = None,
+    db: Session = Depends(get_read_db),
+    admin: schemas.User = Depends(get_current_admin)
+):
+    users, total = customer_metrics.list_admin_users(
+        db, skip=skip, limit=limit, tag=tag, min_ltv=min_ltv, max_ltv=max_ltv, sort_by=sort_by
+    )
+    return responses.model_list(schemas.AdminUserResponse, users, fields, headers={"X-Total-Count": str(total)})
 
 @app.get("/admin/users/{user_id}", response_model=schemas.AdminUserResponse)
-def read_admin_user_detail(user_id: int, db: Session = Depends(get_db), admin: schemas.User = Depends(get_current_admin)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+def read_admin_user_detail(user_id: int, db: Session = Depends(get_read_db), admin: schemas.User = Depends(get_current_admin)):
+    user = customer_metrics.get_admin_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    # Calculate metrics (Same logic - ideally move to service/util)
-    orders = db.query(models.Order).filter(models.Order.user_id == user.id).all()
-    total_spent = sum((order.total_amount or 0) for order in orders)
-    orders_count = len(orders)
-    
-    tags = []
-    if total_spent > 100000:
-        tags.append("VIP")
-    if orders_count > 5:
-        tags.append("Frecuente")
-    if not orders:
-        tags.append("Nuevo")
-        
-    ltv_score = min(int((total_spent / 500000) * 100), 100)
-
-    return {
-        "id": user.id,
-        "email": user.email,
-        "is_active": user.is_active == 1,
-        "is_admin": user.is_admin,
-        "created_at": user.created_at,
-        "last_login": user.last_login,
-        "phone": user.phone,
-        "address": user.address,
-        "total_spent": total_spent,
-        "orders_count": orders_count,
-        "ltv_score": ltv_score,
-        "tags": tags
-    }
+    return user
+
+@app.patch("/admin/users/{user_id}", response_model=schemas.AdminUserResponse)
+def update_admin_user(user_id: int, update: schemas.AdminUserUpdate, db: Session = Depends(get_db), admin: schemas.User = Depends(get_current_admin)):
+    # Block / unblock and promote / demote
+    return users.update_user_flags(db, user_id, update)
+
+@app.get("/admin/cache/stats")
+def get_cache_stats(admin: schemas.User = Depends(get_current_admin)):
+    return {"catalog": cache.catalog_cache.stats(), "users": auth.user_cache.stats()}
+
+@app.get("/admin/metrics")
+def get_route_metrics(admin: schemas.User = Depends(get_current_admin)):
+    # Per-route latency percentiles and SQL statements per request, slowest first
+    return metrics.registry.snapshot()
+
+@app.get("/admin/db/pool")
+def get_db_pool_stats(admin: schemas.User = Depends(get_current_admin)):
+    return database.pool_stats()
+
+# Background Jobs
+@app.post("/admin/jobs", response_model=schemas.JobResponse, status_code=202)
+def create_job(job: schemas.JobCreate, db: Session = Depends(get_db), admin: schemas.User = Depends(get_current_admin)):
+    if job.kind not in jobs.SUBMITTABLE_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(jobs.SUBMITTABLE_KINDS)}")
+    return jobs.submit(db, job.kind, job.params, user_id=admin.id)
+
+@app.get("/admin/jobs", response_model=List[schemas.JobResponse])
+def read_jobs(
+    status: str | None = None, # queued, running, succeeded, failed
+    kind: str | None = None,
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    admin: schemas.User = Depends(get_current_admin)
+):
+    return jobs.list_jobs(db, status=status, kind=kind, skip=skip, limit=limit)
+
+@app.get("/admin/jobs/{job_id}", response_model=schemas.JobResponse)
+def read_job(job_id: int, db: Session = Depends(get_db), admin: schemas.User = Depends(get_current_admin)):
+    job = db.query(models.Job).filter(models.Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 # Inventory Management
 @app.get("/inventory/dashboard")
-def get_inventory_dashboard(db: Session = Depends(get_db), admin: schemas.User = Depends(get_current_admin)):
-    products = db.query(models.Product).all()
-    
-    total_valuation = sum((p.stock_quantity or 0) * (p.cost_price or 0) for p in products)
-    low_stock_count = sum(1 for p in products if (p.stock_quantity or 0) <= (p.min_stock or 0) and (p.stock_quantity or 0) > 0)
-    out_of_stock_count = sum(1 for p in products if (p.stock_quantity or 0) == 0)
-    
-    return {
-        "total_valuation": total_valuation,
-        "low_stock_count": low_stock_count,
-        "out_of_stock_count": out_of_stock_count,
-        "total_sku": len(products)
-    }
+def get_inventory_dashboard(db: Session = Depends(get_read_db), admin: schemas.User = Depends(get_current_admin)):
+    # Served from the catalog cache, keyed by the stock version too: product
+    # edits, stock movements and orders all invalidate it, so the aggregate
+    # only runs once per catalog or stock change
+    cache_key = cache.catalog_cache.key("inventory_dashboard", stock=cache.stock_cache.version())
+    cached = cache.catalog_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    return cache.catalog_cache.set(cache_key, inventory.dashboard_stats(db))
+
+@app.get("/inventory/low-stock", response_model=List[schemas.Product])
+def get_low_stock_products(
+    skip: int = 0,
+    limit: int = 100,
+    include_out_of_stock: bool = False,
+    db: Session = Depends(get_read_db),
+    admin: schemas.User = Depends(get_current_admin)
+):
+    query = inventory.low_stock_query(db, include_out_of_stock=include_out_of_stock)
+    return query.offset(skip).limit(limit).all()
 
 class StockMovementCreate(BaseModel):
     product_id: int
@@ -391,24 +365,30 @@ class StockMovementCreate(BaseModel):
     reason: str | None = None
 
 @app.post("/inventory/movements", response_model=schemas.StockMovementResponse)
-def create_stock_movement(movement: StockMovementCreate, db: Session = Depends(get_db), admin: schemas.User = Depends(get_current_admin)):
+def create_stock_movement(
+    movement: StockMovementCreate,
+    response: Response,
+    idempotency_key: str | None = Header(None), # Retries with the same key don't move stock twice
+    db: Session = Depends(get_db),
+    admin: schemas.User = Depends(get_current_admin)
+):
+    return idempotency.run(
+        db, "inventory-movements", admin.id, idempotency_key, movement, schemas.StockMovementResponse,
+        lambda before_commit: record_stock_movement(db, movement, before_commit), response,
+    )
+
+def record_stock_movement(db: Session, movement: StockMovementCreate, before_commit=None):
     product = db.query(models.Product).filter(models.Product.id == movement.product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    # Update Product Stock
-    if movement.movement_type == "IN":
-        product.stock_quantity += movement.quantity
+    # Update Product Stock (as one atomic UPDATE, safe under concurrent movements)
+    if movement.movement_type in ("IN", "ADJUSTMENT"):
+        # ADJUSTMENT is a delta too: to set an exact stock, the frontend calculates the delta
+        inventory.apply_stock_delta(db, product.id, movement.quantity)
     elif movement.movement_type == "OUT":
-        product.stock_quantity -= movement.quantity
-        if product.stock_quantity < 0:
-             # Option: Allow negative stock or not? For now, allow it but maybe warn.
-             pass
-    elif movement.movement_type == "ADJUSTMENT":
-        # Adjustment sets the absolute stock? Or is it a delta? 
-        # Usually adjustment is a delta too, but let's assume the 'quantity' passed is the DELTA.
-        # If user wants to set exact stock, frontend calculates delta.
-        product.stock_quantity += movement.quantity
+        # Negative stock is allowed for manual outputs
+        inventory.apply_stock_delta(db, product.id, -movement.quantity)
     
     db_movement = models.StockMovement(
         product_id=movement.product_id,
@@ -418,69 +398,31 @@ def create_stock_movement(movement: StockMovementCreate, db: Session = Depends(g
     )
     
     db.add(db_movement)
+    if before_commit:
+        db.flush() # Assigns id and created_at for the stored response
+        before_commit(db, db_movement)
     db.commit()
     db.refresh(db_movement)
+    catalog.invalidate_stock([movement.product_id])
     return db_movement
 
 @app.get("/inventory/movements", response_model=List[schemas.StockMovementResponse])
-def get_stock_movements(product_id: int | None = None, db: Session = Depends(get_db), admin: schemas.User = Depends(get_current_admin)):
-    query = db.query(models.StockMovement)
+def get_stock_movements(product_id: int | None = None, fields: str | None = None, db: Session = Depends(get_db), admin: schemas.User = Depends(get_current_admin)):
+    # Product joined in the same query: no lazy load per movement while serializing
+    query = db.query(models.StockMovement).options(joinedload(models.StockMovement.product))
     if product_id:
         query = query.filter(models.StockMovement.product_id == product_id)
-    return query.order_by(models.StockMovement.created_at.desc()).limit(100).all()
+    movements = query.order_by(models.StockMovement.created_at.desc()).limit(100).all()
+    return responses.model_list(schemas.StockMovementResponse, movements, fields)
 
 # Analytics
 @app.get("/analytics/dashboard", response_model=schemas.DashboardStatsResponse)
-def get_analytics_dashboard(db: Session = Depends(get_db), admin: schemas.User = Depends(get_current_admin)):
-    from sqlalchemy import func, desc
-    from datetime import datetime, timedelta
-
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    
-    orders = db.query(models.Order).filter(models.Order.created_at >= thirty_days_ago).all()
-    total_orders = len(orders)
-    total_revenue = sum(o.total_amount for o in orders)
-
-    conversion_rate = 2.4 
-    avg_ticket = (total_revenue / total_orders) if total_orders > 0 else 0
-
-    # Sales Trend
-    sales_trend_data = db.query(
-        func.date(models.Order.created_at).label('date'),
-        func.sum(models.Order.total_amount).label('revenue'),
-        func.count(models.Order.id).label('orders')
-    ).filter(
-        models.Order.created_at >= thirty_days_ago
-    ).group_by(
-        func.date(models.Order.created_at)
-    ).all()
-
-    sales_trend = [
-        schemas.DailySales(date=str(row.date), revenue=row.revenue or 0, orders=row.orders)
-        for row in sales_trend_data
-    ]
-    
-    # Category Distribution
-    cat_dist_data = db.query(
-        models.Product.category,
-        func.sum(models.OrderItem.price * models.OrderItem.quantity).label('value')
-    ).join(models.Product).join(models.Order).filter(
-        models.Order.created_at >= thirty_days_ago
-    ).group_by(
-        models.Product.category
-    ).all()
-
-    category_distribution = [
-        schemas.CategorySales(name=row.category, value=row.value or 0)
-        for row in cat_dist_data if row.category
-    ]
-
-    return {
-        "totalRevenue": total_revenue,
-        "totalOrders": total_orders,
-        "conversionRate": conversion_rate,
-        "avgTicket": avg_ticket,
-        "salesTrend": sales_trend,
-        "categoryDistribution": category_distribution
-    }
-
+def get_analytics_dashboard(
+    start: date | None = None,
+    end: date | None = None,
+    granularity: str = "day", # day, week, month
+    db: Session = Depends(get_read_db),
+    admin: schemas.User = Depends(get_current_admin)
+):
+    # Defaults to the last 30 days; served from the daily sales rollups
+    return analytics.dashboard(db, start=start, end=end, granularity=granularity)
@@ -0,0 +1,232 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+from . import auth, cache, database
+
+# Request Instrumentation
+# A middleware times every request and labels it with its route template
+# ("/products/{product_id}", not the raw path). SQLAlchemy cursor events count
+# statements and their time into the current request's RequestStats, found
+# through a context variable (it follows the request into the threadpool and
+# into AsyncSession.run_sync). Per route we keep a latency histogram, recent
+# samples for p50/p95/p99 and query totals; /metrics renders them, plus pool
+# and cache stats, in the Prometheus text format.
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200")) # Statements at least this slow are logged
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "") # When set, /metrics requires "Authorization: Bearer <token>"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # Seconds
+QUANTILES = (0.5, 0.95, 0.99)
+QUANTILE_WINDOW = 1024 # Recent requests per route the quantiles are computed over
+
+slow_query_log = logging.getLogger("app.slow_query")
+
+
+class RequestStats:
+    __slots__ = ("endpoint", "queries", "sql_seconds")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.queries = 0
+        self.sql_seconds = 0.0
+
+
+_current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.statuses = {} # "2xx" -> count
+        self.buckets = [0] * len(LATENCY_BUCKETS) # Non-cumulative; summed when rendered
+        self.count = 0
+        self.seconds = 0.0
+        self.recent = deque(maxlen=QUANTILE_WINDOW)
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.max_queries = 0 # Most statements one request ran: an N+1 shows up here first
+
+    def observe(self, status: int, seconds: float, queries: int, sql_seconds: float) -> None:
+        status_class = f"{status // 100}xx"
+        self.statuses[status_class] = self.statuses.get(status_class, 0) + 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.seconds += seconds
+        self.recent.append(seconds)
+        self.queries += queries
+        self.sql_seconds += sql_seconds
+        self.max_queries = max(self.max_queries, queries)
+
+    def quantiles(self) -> dict:
+        samples = sorted(self.recent)
+        if not samples:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: samples[min(int(len(samples) * q), len(samples) - 1)] for q in QUANTILES}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {} # (method, route) -> RouteMetrics
+        self.slow_queries = 0
+        self.queries_outside_requests = 0 # Startup, jobs in thread mode, done-callbacks
+
+    def observe(self, method: str, route: str, status: int, seconds: float, queries: int, sql_seconds: float) -> None:
+        with self._lock:
+            metrics = self.routes.get((method, route))
+            if metrics is None:
+                metrics = self.routes[(method, route)] = RouteMetrics()
+            metrics.observe(status, seconds, queries, sql_seconds)
+
+    def snapshot(self) -> list[dict]:
+        # JSON view for /admin/metrics, slowest p99 first
+        with self._lock:
+            rows = []
+            for (method, route), metrics in self.routes.items():
+                quantiles = metrics.quantiles()
+                rows.append({
+                    "method": method,
+                    "route": route,
+                    "requests": metrics.count,
+                    "statuses": dict(metrics.statuses),
+                    "avg_ms": round(metrics.seconds / metrics.count * 1000, 3),
+                    **{f"p{int(q * 100)}_ms": round(value * 1000, 3) for q, value in quantiles.items()},
+                    "queries_per_request": round(metrics.queries / metrics.count, 2),
+                    "max_queries": metrics.max_queries,
+                    "sql_ms_per_request": round(metrics.sql_seconds / metrics.count * 1000, 3),
+                })
+        return sorted(rows, key=lambda row: row["p99_ms"], reverse=True)
+
+    def render(self) -> str:
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}" if label_text else f"{name}{suffix} {value}")
+
+        with self._lock:
+            routes = sorted(self.routes.items())
+            metric("http_requests_total", "counter", "Requests by route and status class", [
+                ("", {"method": method, "route": route, "status": status}, count)
+                for (method, route), metrics in routes for status, count in sorted(metrics.statuses.items())
+            ])
+            histogram = []
+            for (method, route), metrics in routes:
+                labels = {"method": method, "route": route}
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, metrics.buckets):
+                    cumulative += count
+                    histogram.append(("_bucket", {**labels, "le": bound}, cumulative))
+                histogram.append(("_bucket", {**labels, "le": "+Inf"}, metrics.count))
+                histogram.append(("_sum", labels, round(metrics.seconds, 6)))
+                histogram.append(("_count", labels, metrics.count))
+            metric("http_request_duration_seconds", "histogram", "Request latency by route", histogram)
+            metric("http_request_recent_duration_seconds", "gauge", f"Latency quantiles over the last {QUANTILE_WINDOW} requests per route", [
+                ("", {"method": method, "route": route, "quantile": q}, round(value, 6))
+                for (method, route), metrics in routes for q, value in metrics.quantiles().items()
+            ])
+            metric("http_request_db_queries_total", "counter", "SQL statements run by requests, by route", [
+                ("", {"method": method, "route": route}, metrics.queries) for (method, route), metrics in routes
+            ])
+            metric("http_request_db_seconds_total", "counter", "Time spent in SQL statements by requests, by route", [
+                ("", {"method": method, "route": route}, round(metrics.sql_seconds, 6)) for (method, route), metrics in routes
+            ])
+            metric("http_request_db_queries_max", "gauge", "Most SQL statements run by a single request, by route", [
+                ("", {"method": method, "route": route}, metrics.max_queries) for (method, route), metrics in routes
+            ])
+            metric("db_slow_queries_total", "counter", f"SQL statements slower than {SLOW_QUERY_MS:g}ms", [("", {}, self.slow_queries)])
+            metric("db_queries_outside_requests_total", "counter", "SQL statements run outside any request", [("", {}, self.queries_outside_requests)])
+
+        pools = database.pool_stats()
+        for key, kind in (("size", "gauge"), ("checked_out", "gauge"), ("idle", "gauge"), ("checkouts", "counter"), ("timeouts", "counter"), ("wait_max_ms", "gauge")):
+            metric(f"db_pool_{key}", kind, f"Connection pool {key.replace('_', ' ')}", [
+                ("", {"pool": name}, stats[key]) for name, stats in pools.items()
+            ])
+
+        caches = {"catalog": cache.catalog_cache.stats(), "users": auth.user_cache.stats()}
+        metric("cache_hits_total", "counter", "Cache hits", [("", {"cache": name}, stats["hits"]) for name, stats in caches.items()])
+        metric("cache_misses_total", "counter", "Cache misses", [("", {"cache": name}, stats["misses"]) for name, stats in caches.items()])
+        metric("cache_entries", "gauge", "Cached entries (when the backend can tell)", [
+            ("", {"cache": name}, stats["entries"]) for name, stats in caches.items() if stats["entries"] is not None
+        ])
+        metric("cache_invalidations_total", "counter", "Catalog cache invalidations (writes)", [("", {"cache": "catalog"}, caches["catalog"]["invalidations"])])
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+
+# SQLAlchemy hooks, on every engine (sync, replicas, and the async engines' sync side)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.sql_seconds += elapsed
+    else:
+        registry.queries_outside_requests += 1
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        registry.slow_queries += 1
+        slow_query_log.warning(
+            "%.1fms in %s: %s", elapsed * 1000, stats.endpoint if stats else "no request", " ".join(statement.split())[:1000]
+        )
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def route_label(request: Request) -> str:
+    # The route template keeps label cardinality bounded. Responses returned by
+    # a middleware (304s, 413s) never reached the router, so match it here.
+    route = request.scope.get("route")
+    if route is None:
+        for candidate in request.app.router.routes:
+            match, _ = candidate.matches(request.scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", None) or "unmatched"
+
+
+async def instrument(request: Request, call_next):
+    stats = RequestStats(f"{request.method} {request.url.path}")
+    token = _current_request.set(stats)
+    started = time.perf_counter()
+    status = 500 # Unless a response comes back
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        _current_request.reset(token)
+        registry.observe(request.method, route_label(request), status, elapsed, stats.queries, stats.sql_seconds)
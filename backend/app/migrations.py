@@ -0,0 +1,117 @@
+import importlib.util
+import os
+import re
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, inspect, text
+
+# Schema Migrations
+# Versioned schema changes live in backend/migrations as NNNN_name.py modules
+# with an upgrade(conn) function. schema_migrations records which versions a
+# database has; migrate() applies the missing ones in order, each in its own
+# transaction together with its schema_migrations row. MySQL commits DDL
+# implicitly, so upgrades check before changing anything (the helpers below do)
+# and can safely run again after a failure halfway.
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+FILE_PATTERN = re.compile(r"^(\d{4})_(\w+)\.py$")
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class Migration:
+    def __init__(self, version: int, name: str, path: str):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    def load(self):
+        spec = importlib.util.spec_from_file_location(f"migrations.{self.version:04d}_{self.name}", self.path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+
+def discover(directory: str = MIGRATIONS_DIR) -> list[Migration]:
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = FILE_PATTERN.match(filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def applied_versions(engine) -> set[int]:
+    schema_migrations.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        return {row.version for row in conn.execute(schema_migrations.select())}
+
+
+def pending(engine, directory: str = MIGRATIONS_DIR) -> list[Migration]:
+    applied = applied_versions(engine)
+    return [migration for migration in discover(directory) if migration.version not in applied]
+
+
+def migrate(engine, target: int | None = None, directory: str = MIGRATIONS_DIR, log=print) -> list[int]:
+    # Applies pending migrations up to target (default: all); returns their versions
+    done = []
+    for migration in pending(engine, directory):
+        if target is not None and migration.version > target:
+            break
+        log(f"Applying {migration.version:04d}_{migration.name}...")
+        module = migration.load()
+        with engine.begin() as conn:
+            module.upgrade(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=migration.version, name=migration.name, applied_at=datetime.utcnow()
+            ))
+        done.append(migration.version)
+    return done
+
+
+# Helpers for upgrade(conn): each one checks the current schema first
+
+def has_table(conn, table: str) -> bool:
+    return inspect(conn).has_table(table)
+
+
+def has_column(conn, table: str, column: str) -> bool:
+    return any(existing["name"] == column for existing in inspect(conn).get_columns(table))
+
+
+def add_column(conn, table: str, column: str, definition: str) -> bool:
+    # definition: portable SQL type and default, e.g. "INTEGER DEFAULT 0"
+    if has_column(conn, table, column):
+        return False
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+    return True
+
+
+def has_index(conn, table: str, name: str) -> bool:
+    return any(index["name"] == name for index in inspect(conn).get_indexes(table))
+
+
+def create_index(conn, table: str, name: str, *columns: str, unique: bool = False) -> bool:
+    if has_index(conn, table, name):
+        return False
+    # Detached from the models: only the column names matter for CREATE INDEX
+    columns = Table(table, MetaData(), *(Column(column) for column in columns)).c
+    Index(name, *columns, unique=unique).create(bind=conn)
+    return True
+
+
+def drop_index(conn, table: str, name: str) -> bool:
+    if not has_index(conn, table, name):
+        return False
+    columns = [column for index in inspect(conn).get_indexes(table) if index["name"] == name for column in index["column_names"]]
+    Index(name, *Table(table, MetaData(), *(Column(column) for column in columns)).c).drop(bind=conn)
+    return True
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, DateTime, Date, Boolean, Index, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -20,6 +20,13 @@ class Product(Base):
     cost_price = Column(Float, default=0.0)
     supplier = Column(String(100), nullable=True)
 
+    __table_args__ = (
+        # Category listing sorted by price: filter and order from one index
+        Index("ix_products_category_price", "category", "price"),
+        # Low-stock listing, ordered by stock then id
+        Index("ix_products_stock_id", "stock_quantity", "id"),
+    )
+
 class StockMovement(Base):
     __tablename__ = "stock_movements"
 
@@ -32,6 +39,11 @@ class StockMovement(Base):
     
     product = relationship("Product")
 
+    __table_args__ = (
+        # A product's movements, newest first
+        Index("ix_stock_movements_product_created", "product_id", "created_at"),
+    )
+
 class User(Base):
     __tablename__ = "users"
 
@@ -52,18 +64,82 @@ class Order(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     total_amount = Column(Float)
     status = Column(String(50), default="pending")
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     items = relationship("OrderItem", back_populates="order")
 
+    __table_args__ = (
+        # A customer's order history, newest first
+        Index("ix_orders_user_created", "user_id", "created_at"),
+    )
+
 class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True) # Items of a page of orders (selectinload)
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer)
     price = Column(Float) # Snapshot price at time of purchase
 
     order = relationship("Order", back_populates="items")
     product = relationship("Product")
+
+class CustomerMetrics(Base):
+    __tablename__ = "customer_metrics"
+
+    # Rollup of a user's order history, updated in the same transaction as each order
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_spent = Column(Float, default=0.0, index=True)
+    orders_count = Column(Integer, default=0, index=True)
+    first_order_at = Column(DateTime, nullable=True)
+    last_order_at = Column(DateTime, nullable=True)
+    tags = Column(String(100), default="") # Comma separated, e.g. "VIP,Frecuente"
+    ltv_score = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SalesDaily(Base):
+    __tablename__ = "sales_daily"
+
+    # Daily sales rollup. Each day is spread over a few slots (picked by order id)
+    # so concurrent checkouts don't all queue on a single row lock; reads sum slots.
+    day = Column(Date, primary_key=True)
+    slot = Column(Integer, primary_key=True, default=0)
+    revenue = Column(Float, default=0.0)
+    orders_count = Column(Integer, default=0)
+
+class SalesDailyCategory(Base):
+    __tablename__ = "sales_daily_category"
+
+    day = Column(Date, primary_key=True)
+    category = Column(String(100), primary_key=True) # "" for products without category
+    slot = Column(Integer, primary_key=True, default=0)
+    revenue = Column(Float, default=0.0)
+    units = Column(Integer, default=0)
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    # Long-running admin operation, executed by the worker pool in app/jobs.py
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), index=True) # import_products, rebuild_customer_metrics, rebuild_sales_rollups
+    status = Column(String(20), default="queued", index=True) # queued, running, succeeded, failed
+    params = Column(JSON, nullable=True)
+    progress = Column(Integer, default=0) # Units done (rows, users, days), reported by the job
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) # Last progress report
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # A POST made with an Idempotency-Key header and its response (app/idempotency.py)
+    key = Column(String(64), primary_key=True) # sha256 of route, user and the client's key
+    fingerprint = Column(String(64)) # sha256 of the request body
+    response = Column(JSON, nullable=True) # None while the first request runs
+    locked_until = Column(DateTime, nullable=True) # Claim of the running request, refreshed while it runs; None once done
+    expires_at = Column(DateTime, index=True)
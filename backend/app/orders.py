@@ -0,0 +1,96 @@
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, selectinload
+
+from . import models, schemas, catalog, customer_metrics, inventory, analytics
+
+# Checkout
+# One transaction per order, shared by the sync and async /orders routes.
+
+
+def place_order(db: Session, user_id: int, order: schemas.OrderCreate, before_commit=None) -> schemas.OrderResponse:
+    # before_commit(db, response): runs in the order's transaction (idempotency.run
+    # stores the response there, so both commit together)
+    # 1. Fetch all products in one query, validate items and calculate total server-side
+    product_ids = {item.product_id for item in order.items}
+    products = {
+        product.id: product
+        for product in db.query(models.Product).filter(models.Product.id.in_(product_ids))
+    }
+
+    total_amount = 0
+    order_items_data = []
+    quantities = {} # product_id -> units across all lines
+    category_totals = {} # category -> (revenue, units), for the sales rollups
+
+    for item in order.items:
+        product = products.get(item.product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
+        if item.quantity <= 0:
+            raise HTTPException(status_code=400, detail=f"Invalid quantity for product {item.product_id}")
+
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        revenue, units = category_totals.get(product.category or "", (0, 0))
+        category_totals[product.category or ""] = (revenue + product.price * item.quantity, units + item.quantity)
+        total_amount += product.price * item.quantity
+        order_items_data.append({
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "price": product.price
+        })
+
+    # 2. Reserve stock atomically; a 409 here rolls the whole checkout back
+    inventory.reserve_stock(db, quantities)
+
+    # 3. Create Order, customer rollup, OrderItems and stock movements in the same transaction
+    db_order = models.Order(
+        user_id=user_id,
+        total_amount=total_amount,
+        status="completed", # MVP: Auto-complete for now
+        created_at=datetime.utcnow()
+    )
+    db.add(db_order)
+    customer_metrics.record_order(db, user_id, total_amount, db_order.created_at)
+    db.flush() # Assigns db_order.id
+
+    # Insert all OrderItems with one executemany
+    for item_data in order_items_data:
+        item_data["order_id"] = db_order.id
+    db.execute(insert(models.OrderItem), order_items_data)
+    inventory.record_order_movements(db, db_order.id, quantities)
+    analytics.record_order(db, db_order.id, db_order.created_at, total_amount, category_totals)
+
+    # Serialize before commit, while every attribute is loaded: no refresh round trips
+    response = schemas.OrderResponse.model_validate({
+        "id": db_order.id,
+        "total_amount": total_amount,
+        "status": db_order.status,
+        "items": [
+            {**item_data, "product": products[item_data["product_id"]]}
+            for item_data in order_items_data
+        ],
+    }, from_attributes=True)
+    if before_commit:
+        before_commit(db, response)
+    db.commit()
+    catalog.invalidate_stock(quantities)
+    return response
+
+
+def list_user_orders(db: Session, user_id: int, skip: int = 0, limit: int = 50) -> tuple[list[models.Order], int]:
+    # A page of the user's orders, newest first, with the total for X-Total-Count.
+    # Items and their products are loaded with one IN query each (3 queries per
+    # page) instead of lazily per order and per item while serializing.
+    query = db.query(models.Order).filter(models.Order.user_id == user_id)
+    total = query.count()
+    page = (
+        query.options(selectinload(models.Order.items).selectinload(models.OrderItem.product))
+        .order_by(models.Order.created_at.desc(), models.Order.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    return page, total
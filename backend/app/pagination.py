@@ -0,0 +1,114 @@
+import base64
+import json
+import threading
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+from . import models
+
+# Keyset (cursor) pagination for GET /products.
+# Cursors are opaque base64 tokens holding the sort key of the last row served,
+# so deep pages seek through the index instead of scanning OFFSET rows.
+
+KEYSET_SORTS = ("price_asc", "price_desc", "newest")
+MAX_PAGE_SIZE = 1000 # Upper bound of ?limit= on the listing
+
+# Seconds a cached listing total is reused before COUNT(*) runs again
+COUNT_CACHE_TTL = 30
+COUNT_CACHE_MAX_ENTRIES = 10_000
+
+
+def resolve_sort(sort_by: str | None, searching: bool) -> str:
+    if sort_by in KEYSET_SORTS:
+        return sort_by
+    # Search results without an explicit sort are ranked by relevance
+    return "relevance" if searching else "newest"
+
+
+def encode_cursor(sort: str, **position) -> str:
+    payload = json.dumps({"s": sort, **position}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(position, dict) or position.pop("s", None) != sort:
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort")
+    # Relevance cursors hold a position in the ranked hits
+    offset = position.get("offset", 0)
+    if sort == "relevance" and (type(offset) is not int or offset < 0):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return position
+
+
+def cursor_after(sort: str, product: models.Product) -> str:
+    if sort in ("price_asc", "price_desc"):
+        return encode_cursor(sort, price=product.price, id=product.id)
+    return encode_cursor(sort, id=product.id)
+
+
+def order_by(query, sort: str):
+    # id is always the tie-breaker so the order is total and cursors are stable
+    if sort == "price_asc":
+        return query.order_by(models.Product.price.asc(), models.Product.id.asc())
+    if sort == "price_desc":
+        return query.order_by(models.Product.price.desc(), models.Product.id.desc())
+    return query.order_by(models.Product.id.desc())
+
+
+def seek(query, sort: str, position: dict):
+    try:
+        if sort == "price_asc":
+            price, last_id = float(position["price"]), int(position["id"])
+            return query.filter(or_(
+                models.Product.price > price,
+                and_(models.Product.price == price, models.Product.id > last_id),
+            ))
+        if sort == "price_desc":
+            price, last_id = float(position["price"]), int(position["id"])
+            return query.filter(or_(
+                models.Product.price < price,
+                and_(models.Product.price == price, models.Product.id < last_id),
+            ))
+        return query.filter(models.Product.id < int(position["id"]))
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+class CountCache:
+    """Short-lived cache of listing totals keyed on the active filters."""
+
+    def __init__(self, ttl: float = COUNT_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get_or_count(self, key, count):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry[1] > now:
+            return entry[0]
+        total = count()
+        with self._lock:
+            if len(self._entries) >= COUNT_CACHE_MAX_ENTRIES:
+                self._entries.clear()
+            self._entries[key] = (total, now + self.ttl)
+        return total
+
+    def clear(self, matching=None):
+        # matching: drop only the keys it returns True for
+        with self._lock:
+            if matching is None:
+                self._entries.clear()
+            else:
+                self._entries = {key: entry for key, entry in self._entries.items() if not matching(key)}
+
+
+count_cache = CountCache()
@@ -0,0 +1,185 @@
+import csv
+import os
+from itertools import islice
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import models, search
+
+# CSV Product Import
+# The file is read as a stream and processed in chunks of IMPORT_CHUNK_SIZE rows:
+# one SKU lookup (IN) per chunk, one flush of the new products, one executemany
+# for upserted rows, and a commit. Memory stays bounded by the chunk size and a
+# bad chunk only rolls back itself.
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+IMPORT_MODES = ("create", "upsert") # upsert: existing SKUs get their price / stock updated
+MAX_REPORTED_ERRORS = 1000 # The response lists at most this many; error_count has them all
+STOCK_IMPORT_REASON = "CSV import"
+
+
+class RowError(ValueError):
+    pass
+
+
+def _number(row: dict, column: str, cast):
+    raw = (row.get(column) or "").strip()
+    if not raw:
+        return None
+    try:
+        return cast(raw)
+    except ValueError:
+        raise RowError(f"invalid {column} '{raw}'")
+
+
+def parse_row(row: dict) -> dict:
+    # Blank cells count as missing; None values are filled with defaults on insert
+    return {
+        "name": (row.get("name") or "").strip(),
+        "description": row.get("description") or "",
+        "price": _number(row, "price", float),
+        "stock_quantity": _number(row, "stock", int),
+        "min_stock": _number(row, "min_stock", int),
+        "category": row.get("category") or "General",
+        "sku": (row.get("sku") or "").strip() or None,
+        "image_url": row.get("image_url") or "",
+    }
+
+
+def _report(result: dict, row_number: int, message: str) -> None:
+    result["error_count"] += 1
+    if len(result["errors"]) < MAX_REPORTED_ERRORS:
+        result["errors"].append(f"Row {row_number}: {message}")
+
+
+def _import_chunk(db: Session, chunk: list, mode: str, seen_skus: set, result: dict) -> None:
+    parsed = []
+    for row_number, row in chunk:
+        try:
+            parsed.append((row_number, parse_row(row)))
+        except RowError as e:
+            _report(result, row_number, str(e))
+
+    # 1. Existing SKUs of the whole chunk in one query
+    skus = {data["sku"] for _, data in parsed if data["sku"]}
+    existing = {}
+    if skus:
+        existing = {
+            row.sku: row for row in db.query(
+                models.Product.id, models.Product.sku, models.Product.price, models.Product.stock_quantity
+            ).filter(models.Product.sku.in_(skus))
+        }
+
+    new_products = []
+    updates = [] # executemany parameters for the upsert UPDATE
+    movements = [] # ADJUSTMENT rows for upserted stock changes
+    for row_number, data in parsed:
+        sku = data["sku"]
+        if sku:
+            if sku in seen_skus:
+                _report(result, row_number, f"SKU {sku} appears more than once in the file")
+                continue
+            seen_skus.add(sku)
+
+        current = existing.get(sku) if sku else None
+        if current is not None:
+            if mode != "upsert":
+                _report(result, row_number, f"SKU {sku} already exists")
+                continue
+            # Stock is applied as a delta, so sales committed meanwhile aren't overwritten
+            delta = 0
+            if data["stock_quantity"] is not None:
+                delta = data["stock_quantity"] - (current.stock_quantity or 0)
+            updates.append({
+                "product_id": current.id,
+                "new_price": data["price"] if data["price"] is not None else current.price,
+                "stock_delta": delta,
+            })
+            if delta:
+                movements.append({
+                    "product_id": current.id,
+                    "quantity": delta,
+                    "movement_type": "ADJUSTMENT",
+                    "reason": STOCK_IMPORT_REASON,
+                })
+            continue
+
+        if not data["name"] or data["price"] is None:
+            _report(result, row_number, "name and price are required")
+            continue
+        new_products.append(models.Product(
+            name=data["name"],
+            description=data["description"],
+            price=data["price"],
+            stock_quantity=data["stock_quantity"] if data["stock_quantity"] is not None else 0,
+            min_stock=data["min_stock"] if data["min_stock"] is not None else 5,
+            category=data["category"],
+            sku=sku,
+            image_url=data["image_url"],
+        ))
+
+    if not new_products and not updates:
+        return
+
+    # 2. Write the chunk in one transaction
+    search_engine = search.get_search_engine()
+    indexed = []
+    try:
+        if new_products:
+            db.add_all(new_products)
+            db.flush() # Batched INSERTs; assigns ids
+            # Index while attributes are loaded; undone below if the commit fails
+            search_engine.index_products(new_products)
+            indexed = [product.id for product in new_products]
+        if updates:
+            table = models.Product.__table__
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam("product_id"))
+                .values(price=bindparam("new_price"), stock_quantity=table.c.stock_quantity + bindparam("stock_delta")),
+                updates,
+            )
+        if movements:
+            db.execute(insert(models.StockMovement), movements)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        for product_id in indexed:
+            search_engine.remove_product(product_id)
+        _report(result, chunk[0][0], f"rows {chunk[0][0]}-{chunk[-1][0]} were not imported ({e.__class__.__name__})")
+        return
+
+    result["created"] += len(new_products)
+    result["updated"] += len(updates)
+    db.expunge_all() # Keep the session from holding on to every imported product
+
+
+def import_products(db: Session, stream, mode: str = "create", chunk_size: int = IMPORT_CHUNK_SIZE, progress=None) -> dict:
+    # stream: text lines with a header row (name, price, description, stock,
+    # min_stock, category, sku, image_url); progress(rows_done) after each chunk
+    if mode not in IMPORT_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(IMPORT_MODES)}")
+    result = {"created": 0, "updated": 0, "errors": [], "error_count": 0}
+    seen_skus = set()
+    # Row numbers as a spreadsheet shows them: the header is row 1
+    reader = csv.DictReader(stream)
+    rows = enumerate(reader, start=2)
+    while True:
+        chunk = []
+        try:
+            chunk.extend(islice(rows, chunk_size))
+        except (csv.Error, UnicodeDecodeError) as e:
+            # Unreadable from here on: import what was read, report where it stopped
+            _report(result, reader.line_num + 1, f"unreadable CSV, import stopped ({e})")
+            if chunk:
+                _import_chunk(db, chunk, mode, seen_skus, result)
+            break
+        if not chunk:
+            break
+        _import_chunk(db, chunk, mode, seen_skus, result)
+        if progress:
+            progress(chunk[-1][0] - 1)
+    return result
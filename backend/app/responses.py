@@ -0,0 +1,90 @@
+import os
+from functools import lru_cache
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+from starlette.middleware.gzip import GZipMiddleware
+
+from . import schemas
+
+try:
+    import orjson # Optional dependency: falls back to the standard json module
+except ImportError:
+    orjson = None
+
+try:
+    from brotli_asgi import BrotliMiddleware # Optional dependency: brotli, with gzip fallback
+except ImportError:
+    BrotliMiddleware = None
+
+# Response Encoding
+# Large listings skip FastAPI's validate-then-serialize pass: they are returned
+# as FastJSONResponse, either from data that is already JSON-ready (the catalog
+# cache) or serialized straight to bytes by Pydantic. ?fields= trims list items
+# to the requested fields, and CompressionMiddleware compresses the result.
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1000")) # Bytes; smaller bodies aren't worth it
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+UNCOMPRESSED_PATHS = ("/static/", "/images/") # Already compressed image formats
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson; bytes content is passed through as-is."""
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class CompressionMiddleware:
+    """Brotli (when brotli_asgi is installed) or gzip, except for image paths."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        if BrotliMiddleware is not None:
+            self.compressed = BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+        else:
+            self.compressed = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=GZIP_LEVEL)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not scope["path"].startswith(UNCOMPRESSED_PATHS):
+            await self.compressed(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+def parse_fields(fields: str | None, model: type[BaseModel]) -> set[str] | None:
+    # "id,name,price" -> {"id", "name", "price"}; None = every field
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(model.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested
+
+
+def product_page(page: dict, fields: str | None = None) -> FastJSONResponse:
+    # page: a PaginatedProductResponse already dumped to JSON-ready data
+    selected = parse_fields(fields, schemas.Product)
+    if selected is not None:
+        page = {**page, "items": [{name: item[name] for name in item if name in selected} for item in page["items"]]}
+    return FastJSONResponse(page)
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model])
+
+
+def model_list(model: type[BaseModel], objects, fields: str | None = None, headers: dict | None = None) -> FastJSONResponse:
+    # ORM objects (or dicts) validated and serialized to JSON bytes in one Pydantic pass
+    selected = parse_fields(fields, model)
+    adapter = _list_adapter(model)
+    items = adapter.validate_python(objects, from_attributes=True)
+    body = adapter.dump_json(items, include={"__all__": selected} if selected is not None else None)
+    return FastJSONResponse(body, headers=headers)
@@ -81,9 +81,30 @@ class StockMovementResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+class PriceRangeFacet(BaseModel):
+    min: float
+    max: float | None = None # None: open-ended last range
+    count: int
+
+class AvailabilityFacet(BaseModel):
+    in_stock: int
+    out_of_stock: int
+
+class ProductFacets(BaseModel):
+    categories: list[FacetValue]
+    price_ranges: list[PriceRangeFacet]
+    availability: AvailabilityFacet
+
 class PaginatedProductResponse(BaseModel):
     items: list[Product]
-    total: int
+    total: int | None = None # None when requested with include_total=false
+    next_cursor: str | None = None
+    has_more: bool = False
+    facets: ProductFacets | None = None # Only with facets=true
 
 class AdminUserResponse(UserBase):
     id: int
@@ -103,6 +124,10 @@ class AdminUserResponse(UserBase):
     class Config:
         from_attributes = True
 
+class AdminUserUpdate(BaseModel):
+    is_active: bool | None = None
+    is_admin: bool | None = None
+
 class DailySales(BaseModel):
     date: str
     revenue: float
@@ -119,3 +144,23 @@ class DashboardStatsResponse(BaseModel):
     avgTicket: float
     salesTrend: list[DailySales]
     categoryDistribution: list[CategorySales]
+
+class JobCreate(BaseModel):
+    kind: str # rebuild_customer_metrics, rebuild_sales_rollups
+    params: dict = {}
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    params: dict | None = None
+    progress: int = 0
+    result: dict | None = None
+    error: str | None = None
+    created_at: datetime | None = None
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    updated_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
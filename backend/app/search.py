@@ -0,0 +1,318 @@
+import bisect
+import functools
+import heapq
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from types import SimpleNamespace
+
+# Search Engine
+# In-process inverted index over the product catalog. Replaces the
+# LIKE '%q%' scans in GET /products; kept in sync by the product write endpoints.
+# Writes made by other processes are picked up by a full rebuild every
+# SEARCH_REFRESH_SECONDS, done in the background while searches keep using the
+# current index.
+
+SEARCH_REFRESH_SECONDS = float(os.getenv("SEARCH_REFRESH_SECONDS", "60"))
+INDEXED_FIELDS = ("id", "name", "description", "category", "sku")
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "el", "en", "la", "las", "lo", "los",
+    "para", "por", "un", "una", "y", "o", "the", "and", "of", "for",
+}
+
+# Field weights used when indexing (name matters more than description)
+FIELD_WEIGHTS = {"name": 3.0, "category": 2.0, "sku": 2.0, "description": 1.0}
+
+# Max vocabulary terms a single prefix may expand to ("c" -> camiseta, cable, ...)
+MAX_PREFIX_EXPANSIONS = 50
+# Prefix expansions score lower than exact term matches
+PREFIX_PENALTY = 0.6
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def fold(text: str) -> str:
+    # Lowercase and strip accents: "Ecológica" -> "ecologica", "Niño" -> "nino"
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+@functools.lru_cache(maxsize=100_000)
+def stem(token: str) -> str:
+    # Light Spanish plural stripping: "botellas" -> "botella", "camiones" -> "camion"
+    if len(token) > 4 and token.endswith("es") and token[-3] in "lnrdzj":
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str | None) -> list[str]:
+    if not text:
+        return []
+    return [stem(t) for t in TOKEN_RE.findall(fold(text)) if t not in STOPWORDS]
+
+
+class SearchEngine:
+    """Interface for catalog search backends used by GET /products?q=."""
+
+    def is_ready(self) -> bool:
+        raise NotImplementedError
+
+    def build(self, products) -> None:
+        raise NotImplementedError
+
+    def index_product(self, product) -> None:
+        raise NotImplementedError
+
+    def index_products(self, products) -> None:
+        for product in products:
+            self.index_product(product)
+
+    def remove_product(self, product_id: int) -> None:
+        raise NotImplementedError
+
+    def search(self, query: str, limit: int | None = None) -> list[tuple[int, float]]:
+        # Every matching product, best first (limit: only the top ones)
+        raise NotImplementedError
+
+    def search_page(self, query: str, offset: int, limit: int) -> tuple[list[int], int]:
+        # Ids of one page of the ranked hits, and how many hits there are
+        hits = self.search(query)
+        return [product_id for product_id, _ in hits[offset:offset + limit]], len(hits)
+
+    def ensure_ready(self, db) -> None:
+        # Lazily load the whole catalog the first time a search hits this process
+        if not self.is_ready():
+            self.build(catalog_rows(db))
+        self.refresh_if_stale()
+
+    def refresh_if_stale(self) -> None:
+        # Picks up writes made by other processes; must not block the caller
+        pass
+
+
+def catalog_rows(db):
+    from . import models
+    return db.query(*(getattr(models.Product, field) for field in INDEXED_FIELDS)).yield_per(1000)
+
+
+class InMemorySearchEngine(SearchEngine):
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ready = False
+        self._built_at = 0.0
+        self._replay = None # Writes made during a background rebuild, applied to its result
+        self._reset()
+
+    def _reset(self):
+        self._postings = defaultdict(dict)  # term -> {product_id: weighted tf}
+        self._doc_terms = {}                # product_id -> set of terms
+        self._doc_len = {}                  # product_id -> weighted length
+        self._total_len = 0.0
+        self._vocabulary = []               # sorted terms, for prefix lookups
+
+    def is_ready(self) -> bool:
+        return self._ready
+
+    def build(self, products) -> None:
+        with self._lock:
+            self._reset()
+            new_terms = []
+            for product in products:
+                self._add(product, new_terms)
+            self._vocabulary = sorted(new_terms)
+            self._ready = True
+            self._built_at = time.monotonic()
+
+    def refresh_if_stale(self) -> None:
+        with self._lock:
+            if not self._ready or self._replay is not None or time.monotonic() - self._built_at < SEARCH_REFRESH_SECONDS:
+                return
+            self._replay = []
+        threading.Thread(target=self._rebuild, daemon=True).start()
+
+    def _rebuild(self) -> None:
+        # Builds a fresh index from the database and swaps it in
+        from .database import SessionLocal
+        fresh = InMemorySearchEngine()
+        db = SessionLocal()
+        try:
+            fresh.build(catalog_rows(db))
+        except Exception:
+            with self._lock:
+                self._replay = None
+                self._built_at = time.monotonic() # Retried after another SEARCH_REFRESH_SECONDS
+            raise
+        finally:
+            db.close()
+        with self._lock:
+            for product_id, product in self._replay:
+                if product is None:
+                    fresh.remove_product(product_id)
+                else:
+                    fresh.index_product(product)
+            self._replay = None
+            changed = fresh._doc_terms != self._doc_terms or fresh._doc_len != self._doc_len
+            self._postings, self._doc_terms, self._doc_len = fresh._postings, fresh._doc_terms, fresh._doc_len
+            self._total_len, self._vocabulary = fresh._total_len, fresh._vocabulary
+            self._built_at = fresh._built_at
+        if changed:
+            # Search results cached before the rebuild may miss those writes
+            from . import catalog
+            catalog.invalidate_search()
+
+    def _record(self, product_id: int, product=None) -> None:
+        # A copy of the indexed fields: the ORM object may be expired by the time it's replayed
+        if self._replay is not None:
+            snapshot = None if product is None else SimpleNamespace(**{field: getattr(product, field, None) for field in INDEXED_FIELDS})
+            self._replay.append((product_id, snapshot))
+
+    def index_product(self, product) -> None:
+        with self._lock:
+            if not self._ready:
+                return # build() will read it from the database anyway
+            self._record(product.id, product)
+            self._remove(product.id)
+            self._add(product)
+
+    def index_products(self, products) -> None:
+        # Batch version for imports: one merge of the new terms into the vocabulary
+        # instead of one sorted insert per term
+        with self._lock:
+            if not self._ready:
+                return
+            new_terms = []
+            for product in products:
+                self._record(product.id, product)
+                self._remove(product.id)
+                self._add(product, new_terms)
+            if new_terms:
+                new_terms = sorted(term for term in set(new_terms) if term in self._postings)
+                self._vocabulary = sorted(self._vocabulary + new_terms) # Two sorted runs: a linear merge
+
+    def remove_product(self, product_id: int) -> None:
+        with self._lock:
+            self._record(product_id)
+            self._remove(product_id)
+
+    def _add(self, product, new_terms=None):
+        # new_terms: collects terms new to the index instead of inserting them into the vocabulary
+        weights = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(getattr(product, field, None)):
+                weights[term] += weight
+        if not weights:
+            return
+        for term, weight in weights.items():
+            posting = self._postings[term]
+            if not posting:
+                if new_terms is None:
+                    bisect.insort(self._vocabulary, term)
+                else:
+                    new_terms.append(term)
+            posting[product.id] = weight
+        length = sum(weights.values())
+        self._doc_terms[product.id] = set(weights)
+        self._doc_len[product.id] = length
+        self._total_len += length
+
+    def _remove(self, product_id):
+        terms = self._doc_terms.pop(product_id, None)
+        if terms is None:
+            return
+        self._total_len -= self._doc_len.pop(product_id)
+        for term in terms:
+            posting = self._postings[term]
+            posting.pop(product_id, None)
+            if not posting:
+                del self._postings[term]
+                index = bisect.bisect_left(self._vocabulary, term)
+                if index < len(self._vocabulary) and self._vocabulary[index] == term:
+                    del self._vocabulary[index]
+
+    def _expand(self, token):
+        # Exact term first, then vocabulary terms starting with the token
+        expansions = []
+        if token in self._postings:
+            expansions.append((token, 1.0))
+        start = bisect.bisect_left(self._vocabulary, token)
+        for term in self._vocabulary[start:]:
+            if len(expansions) >= MAX_PREFIX_EXPANSIONS or not term.startswith(token):
+                break
+            if term != token:
+                expansions.append((term, PREFIX_PENALTY))
+        return expansions
+
+    def _token_scores(self, token, doc_count, avg_len):
+        # BM25 score per document for one query token (best matching expansion wins)
+        scores = {}
+        for term, factor in self._expand(token):
+            posting = self._postings[term]
+            idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for product_id, tf in posting.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_len[product_id] / avg_len)
+                score = factor * idf * tf * (BM25_K1 + 1) / (tf + norm)
+                if score > scores.get(product_id, 0.0):
+                    scores[product_id] = score
+        return scores
+
+    def _scores(self, query: str) -> dict:
+        # product_id -> score of every matching product
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return {}
+        with self._lock:
+            doc_count = len(self._doc_len)
+            if not doc_count:
+                return {}
+            avg_len = self._total_len / doc_count
+            per_token = [self._token_scores(t, doc_count, avg_len) for t in tokens]
+
+        # Every query token must match (AND); intersect starting from the rarest
+        per_token.sort(key=len)
+        totals = dict(per_token[0])
+        for scores in per_token[1:]:
+            if not totals:
+                break
+            totals = {pid: s + scores[pid] for pid, s in totals.items() if pid in scores}
+        return totals
+
+    def search(self, query: str, limit: int | None = None) -> list[tuple[int, float]]:
+        return _ranked(self._scores(query), limit)
+
+    def search_page(self, query: str, offset: int, limit: int) -> tuple[list[int], int]:
+        # Only the hits up to the page's end are ranked
+        totals = self._scores(query)
+        page = _ranked(totals, offset + limit)[offset:]
+        return [product_id for product_id, _ in page], len(totals)
+
+
+def _ranked(totals: dict, limit: int | None = None) -> list[tuple[int, float]]:
+    # Ties broken by newest product first, same as the default listing order
+    rank = lambda hit: (hit[1], hit[0])
+    if limit is not None and limit < len(totals):
+        return heapq.nlargest(limit, totals.items(), key=rank)
+    return sorted(totals.items(), key=rank, reverse=True)
+
+
+_engine: SearchEngine = InMemorySearchEngine()
+
+
+def get_search_engine() -> SearchEngine:
+    return _engine
+
+
+def set_search_engine(engine: SearchEngine) -> None:
+    global _engine
+    _engine = engine
@@ -0,0 +1,204 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+from fastapi import HTTPException
+
+# Upload Storage
+# Uploaded images are stored under the sha256 of their content, so the same
+# image uploaded twice is stored once and gets the same URL. Where the bytes
+# live is up to the backend: the local uploads directory (served at /static) or
+# an S3-compatible bucket.
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local") # local, s3, local-s3
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+# Partial uploads, outside UPLOAD_DIR so /static never serves them. Must be on
+# the same filesystem, so storing a finished upload is an atomic rename.
+# Default: a sibling of the upload directory (uploads.incoming)
+UPLOAD_TEMP_DIR = os.getenv("UPLOAD_TEMP_DIR")
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://localhost:8000/static") # Where clients fetch stored files
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") # MinIO / other S3-compatible services
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+CHUNK_SIZE = 1024 * 1024
+
+CONTENT_TYPES = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+}
+# Leading bytes of each format: the extension has to match the content
+SIGNATURES = {
+    "jpg": (b"\xff\xd8\xff",),
+    "jpeg": (b"\xff\xd8\xff",),
+    "png": (b"\x89PNG\r\n\x1a\n",),
+    "gif": (b"GIF87a", b"GIF89a"),
+    "webp": (b"RIFF",),
+}
+EXTENSION_ALIASES = {"jpeg": "jpg"} # One key per content, whatever the file was called
+
+
+class StorageBackend:
+    """Interface for upload storage."""
+
+    name = "base"
+    temp_dir = None # Where uploads are spooled before save(); None = system temp dir
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def save(self, key: str, path: str, content_type: str) -> None:
+        # Takes ownership of the file at path
+        raise NotImplementedError
+
+    def open(self, key: str):
+        # Binary file object with the stored bytes; FileNotFoundError if missing
+        raise NotImplementedError
+
+    def url(self, key: str) -> str:
+        return f"{PUBLIC_BASE_URL.rstrip('/')}/{key}"
+
+
+class LocalStorage(StorageBackend):
+    """Files in a local directory, served by the app's /static mount."""
+
+    name = "local"
+
+    def __init__(self, directory: str = UPLOAD_DIR, temp_dir: str | None = UPLOAD_TEMP_DIR):
+        self.directory = directory
+        self.temp_dir = temp_dir or os.path.normpath(directory) + ".incoming"
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    def exists(self, key):
+        return os.path.exists(os.path.join(self.directory, key))
+
+    def save(self, key, path, content_type):
+        os.replace(path, os.path.join(self.directory, key))
+
+    def open(self, key):
+        return open(os.path.join(self.directory, key), "rb")
+
+
+class S3Storage(StorageBackend):
+    """Objects in an S3-compatible bucket, over any boto3-compatible client."""
+
+    name = "s3"
+
+    def __init__(self, client, bucket: str = S3_BUCKET):
+        self.client = client
+        self.bucket = bucket
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except Exception as e:
+            if _error_code(e) in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def save(self, key, path, content_type):
+        try:
+            self.client.upload_file(path, self.bucket, key, ExtraArgs={
+                "ContentType": content_type,
+                # Content-addressed keys never change content
+                "CacheControl": "public, max-age=31536000, immutable",
+            })
+        finally:
+            os.remove(path)
+
+    def open(self, key):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        except Exception as e:
+            if _error_code(e) in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(key)
+            raise
+
+
+def _error_code(error) -> str | None:
+    return str(getattr(error, "response", {}).get("Error", {}).get("Code", "")) or None
+
+
+class LocalS3:
+    """In-process stand-in for the subset of the boto3 S3 client used by S3Storage."""
+
+    class NotFound(Exception):
+        response = {"Error": {"Code": "404"}}
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.objects = {} # (bucket, key) -> (bytes, extra_args)
+
+    def head_object(self, Bucket, Key):
+        with self._lock:
+            if (Bucket, Key) not in self.objects:
+                raise self.NotFound()
+            data, extra = self.objects[(Bucket, Key)]
+            return {"ContentLength": len(data), **extra}
+
+    def get_object(self, Bucket, Key):
+        with self._lock:
+            if (Bucket, Key) not in self.objects:
+                raise self.NotFound()
+            return {"Body": io.BytesIO(self.objects[(Bucket, Key)][0])}
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None):
+        with open(Filename, "rb") as file:
+            data = file.read()
+        with self._lock:
+            self.objects[(Bucket, Key)] = (data, dict(ExtraArgs or {}))
+
+
+def create_backend(kind: str = STORAGE_BACKEND) -> StorageBackend:
+    if kind == "s3":
+        import boto3 # Optional dependency, only needed for the S3 backend
+        return S3Storage(boto3.client("s3", endpoint_url=S3_ENDPOINT_URL))
+    if kind == "local-s3":
+        return S3Storage(LocalS3(), bucket=S3_BUCKET or "uploads")
+    return LocalStorage()
+
+
+storage = create_backend()
+
+
+def store_upload(file, filename: str | None, size: int | None = None, backend: StorageBackend | None = None) -> str:
+    # Blocking: call it from the threadpool. Streams file to a temp file while
+    # hashing it, then hands it to the backend unless the content is already stored.
+    backend = backend or storage
+    extension = (filename or "").rsplit(".", 1)[-1].lower() if "." in (filename or "") else ""
+    if extension not in CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type, allowed: {', '.join(CONTENT_TYPES)}")
+    if size is not None and size > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File larger than {UPLOAD_MAX_BYTES} bytes")
+
+    digest = hashlib.sha256()
+    written = 0
+    temp = tempfile.NamedTemporaryFile(dir=backend.temp_dir, delete=False)
+    try:
+        with temp:
+            while chunk := file.read(CHUNK_SIZE):
+                if written == 0 and not chunk.startswith(SIGNATURES[extension]):
+                    raise HTTPException(status_code=400, detail=f"File content is not a valid {extension} image")
+                written += len(chunk)
+                if written > UPLOAD_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=f"File larger than {UPLOAD_MAX_BYTES} bytes")
+                digest.update(chunk)
+                temp.write(chunk)
+        if written == 0:
+            raise HTTPException(status_code=400, detail="Empty file")
+
+        key = f"{digest.hexdigest()}.{EXTENSION_ALIASES.get(extension, extension)}"
+        if backend.exists(key):
+            os.remove(temp.name) # Already stored: same content, same URL
+        else:
+            backend.save(key, temp.name, CONTENT_TYPES[extension])
+        return backend.url(key)
+    except BaseException:
+        if os.path.exists(temp.name):
+            os.remove(temp.name)
+        raise
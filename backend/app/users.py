@@ -0,0 +1,97 @@
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from . import models, schemas, auth, customer_metrics
+
+# Request Authentication
+# Shared by the sync (main.py) and async (async_api.py) get_current_user: the
+# token's uid claim is looked up in auth.user_cache, and load_user only runs on
+# a miss.
+
+
+def load_user(db: Session, claims: dict) -> schemas.User | None:
+    query = db.query(models.User)
+    if "uid" in claims:
+        version = auth.user_cache.version(claims["uid"])
+        query = query.filter(models.User.id == claims["uid"])
+    else:
+        # Tokens issued before the uid claim existed
+        version = None
+        query = query.filter(models.User.email == claims["sub"])
+    user = query.first()
+    if user is None:
+        return None
+    current = schemas.User.model_validate(user)
+    auth.user_cache.set(current, auth.user_cache.version(current.id) if version is None else version)
+    return current
+
+
+def check_active(user: schemas.User | None) -> schemas.User:
+    if user is None:
+        raise auth.credentials_exception()
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
+
+
+def get_user_by_email(db: Session, email: str) -> models.User | None:
+    return db.query(models.User).filter(models.User.email == email).first()
+
+
+def save_password_hash(db: Session, user_id: int, hashed_password: str) -> None:
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.hashed_password: hashed_password}, synchronize_session=False
+    )
+    db.commit()
+
+
+def create_user(db: Session, email: str, hashed_password: str) -> models.User:
+    db_user = models.User(email=email, hashed_password=hashed_password)
+    db.add(db_user)
+    db.flush()
+    # Empty rollup row up front, so the first order only has to lock and update it
+    db.add(models.CustomerMetrics(user_id=db_user.id, total_spent=0.0, orders_count=0, tags="Nuevo", ltv_score=0))
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+
+async def authenticate(run_db, username: str, password: str) -> schemas.User:
+    # run_db(fn, *args) runs fn(session, *args) off the event loop: run_in_threadpool
+    # on the sync path, AsyncSession.run_sync on the async one. bcrypt runs in auth's
+    # hashing pool, so this coroutine never blocks the loop.
+    retry_after = auth.login_limiter.retry_after(username)
+    if retry_after:
+        raise auth.rate_limited_exception(retry_after)
+
+    user = await run_db(get_user_by_email, username)
+    version = auth.user_cache.version(user.id) if user else None
+    verified, new_hash = (False, None)
+    if user:
+        verified, new_hash = await auth.verify_and_update_password(password, user.hashed_password)
+    if not verified:
+        auth.login_limiter.record_failure(username)
+        raise auth.login_exception()
+
+    auth.login_limiter.reset(username)
+    # Snapshot before any commit expires the instance; it also warms the user cache
+    current = schemas.User.model_validate(user)
+    auth.user_cache.set(current, version)
+    if new_hash:
+        # Stored with an outdated cost factor: upgrade it now that we have the password
+        await run_db(save_password_hash, current.id, new_hash)
+    return current
+
+
+def update_user_flags(db: Session, user_id: int, update: schemas.AdminUserUpdate) -> dict:
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    if update.is_active is not None:
+        user.is_active = 1 if update.is_active else 0
+    if update.is_admin is not None:
+        user.is_admin = update.is_admin
+    db.commit()
+    # Deactivation and demotion apply to this user's next request, not at token expiry
+    auth.user_cache.invalidate(user_id)
+    return customer_metrics.get_admin_user(db, user_id)
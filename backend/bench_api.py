@@ -0,0 +1,215 @@
+import argparse
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from seed_synthetic import ADMIN_EMAIL, PASSWORD, CUSTOMER_EMAIL, NOUNS, ADJECTIVES, CATEGORIES, SEED_NOW
+
+# API benchmark against a live server seeded with seed_synthetic.py. Each
+# scenario runs for a fixed time from concurrent clients (after a warmup) and
+# reports throughput and p50/p95/p99. Results are written as JSON with the git
+# commit, so runs on different commits can be compared:
+#   python bench_api.py --output before.json
+#   (checkout, restart the server)
+#   python bench_api.py --output after.json --compare before.json
+# The focused benchmarks (bench_async_db.py, bench_login.py,
+# load_test_checkout.py) use login() and measure() from here, against the same
+# seeded database.
+
+SCENARIOS = ("search", "list", "detail", "login", "checkout", "admin_users", "inventory_dashboard", "analytics_dashboard")
+CHECKOUT_PRODUCTS = 20 # Checkouts spread over this many high-stock products, so they don't measure one hot row
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+def login(api_url, email=ADMIN_EMAIL, password=PASSWORD):
+    # Authorization header for a seeded user (the admin by default)
+    res = requests.post(f"{api_url}/token", data={"username": email, "password": password})
+    res.raise_for_status()
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Context:
+    """What the scenarios need to know about the seeded server."""
+
+    def __init__(self, api_url, customers):
+        self.api_url = api_url
+        self.customers = customers
+        self.admin = login(api_url)
+        self.product_count = requests.get(f"{api_url}/products", params={"limit": 1}).json()["total"]
+        self.checkout_products = [self._create_checkout_product() for _ in range(CHECKOUT_PRODUCTS)]
+        # The search index is built by the first search: not something to measure
+        requests.get(f"{api_url}/products", params={"q": NOUNS[0], "limit": 1}).raise_for_status()
+
+    def _create_checkout_product(self):
+        res = requests.post(f"{self.api_url}/products", headers=self.admin, json={
+            "name": "Bench Checkout Product",
+            "price": 10,
+            "image_url": "/file.svg",
+            "category": "Bench",
+            "sku": f"BENCH-{uuid.uuid4().hex[:12]}",
+            "stock_quantity": 10_000_000,
+        })
+        res.raise_for_status()
+        return res.json()["id"]
+
+
+def make_scenarios(ctx):
+    # name -> call(session, rng) -> bool; parameters vary so caches see a realistic mix
+    url = ctx.api_url
+    return {
+        "search": lambda s, rng: s.get(f"{url}/products", params={
+            "q": f"{rng.choice(NOUNS)} {rng.choice(ADJECTIVES)}", "limit": 20,
+        }).ok,
+        "list": lambda s, rng: s.get(f"{url}/products", params={
+            "category": rng.choice(CATEGORIES), "limit": 20, "skip": rng.randrange(0, 200, 20),
+            "sort_by": rng.choice(("price_asc", "price_desc", "newest")),
+        }).ok,
+        "detail": lambda s, rng: s.get(f"{url}/products/{rng.randint(1, ctx.product_count)}").ok,
+        "login": lambda s, rng: s.post(f"{url}/token", data={
+            "username": CUSTOMER_EMAIL.format(rng.randint(1, ctx.customers)), "password": PASSWORD,
+        }).ok,
+        "checkout": lambda s, rng: s.post(f"{url}/orders", headers=ctx.admin, json={
+            "items": [{"product_id": rng.choice(ctx.checkout_products), "quantity": 1}],
+        }).ok,
+        "admin_users": lambda s, rng: s.get(f"{url}/admin/users", headers=ctx.admin, params={
+            "limit": 50, "skip": rng.randrange(0, 1000, 50), "sort_by": rng.choice(("spent_desc", "orders_desc", "newest")),
+        }).ok,
+        "inventory_dashboard": lambda s, rng: s.get(f"{url}/inventory/dashboard", headers=ctx.admin).ok,
+        # The default window is the last 30 days of today's date: empty for the seeded history
+        "analytics_dashboard": lambda s, rng: s.get(f"{url}/analytics/dashboard", headers=ctx.admin, params={
+            "start": (SEED_NOW - timedelta(days=rng.choice((30, 90, 365)))).date().isoformat(),
+            "end": SEED_NOW.date().isoformat(),
+            "granularity": rng.choice(("day", "week", "month")),
+        }).ok,
+    }
+
+
+def measure(call, workers, seconds, warmup=0.0, seed=42):
+    # call(session, rng) -> bool from `workers` threads for warmup + seconds
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + seconds
+
+    def worker(index):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + index) # Same request sequence on every run
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            begin = time.perf_counter()
+            try:
+                ok = call(session, rng)
+            except requests.RequestException:
+                ok = False
+            end = time.perf_counter()
+            if begin < measure_from:
+                continue # Warmup: fill caches and connection pools
+            with lock:
+                latencies.append(end - begin)
+                if not ok:
+                    errors += 1
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(worker, range(workers)))
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / seconds, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as file:
+        data = json.load(file)
+    baseline = {row["scenario"]: row for row in data["scenarios"]}
+    print(f"\nvs {baseline_path} (commit {data['meta']['commit']})")
+    print(f"{'scenario':<22}{'req/s':>10}{'change':>9}{'p99 ms':>10}{'change':>9}")
+    for row in results["scenarios"]:
+        before = baseline.get(row["scenario"])
+        if not before:
+            continue
+        rps_change = (row["rps"] / before["rps"] - 1) * 100 if before["rps"] else 0.0
+        p99_change = (row["p99_ms"] / before["p99_ms"] - 1) * 100 if before["p99_ms"] else 0.0
+        print(f"{row['scenario']:<22}{row['rps']:>10.1f}{rps_change:>+8.1f}%{row['p99_ms']:>10.1f}{p99_change:>+8.1f}%")
+
+
+def run(args):
+    ctx = Context(args.url, args.customers)
+    scenarios = make_scenarios(ctx)
+    selected = args.scenarios.split(",") if args.scenarios else SCENARIOS
+    unknown = set(selected) - set(scenarios)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    commit = git_commit()
+    results = {
+        "meta": {
+            "commit": commit,
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "url": args.url,
+            "workers": args.workers,
+            "seconds": args.seconds,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "products": ctx.product_count,
+            "python": platform.python_version(),
+        },
+        "scenarios": [],
+    }
+    print(f"{args.workers} clients, {args.seconds}s per scenario after {args.warmup}s warmup, {ctx.product_count} products, commit {commit}")
+    print(f"{'scenario':<22}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name in selected:
+        row = {"scenario": name, **measure(scenarios[name], args.workers, args.seconds, args.warmup, args.seed)}
+        results["scenarios"].append(row)
+        print(f"{name:<22}{row['rps']:>10.1f}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['errors']:>8}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the API against a server seeded with seed_synthetic.py")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--workers", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--seconds", type=float, default=10, help="measured time per scenario")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured time before each scenario")
+    parser.add_argument("--scenarios", help=f"comma separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--customers", type=int, default=5_000, help="--users given to seed_synthetic.py")
+    parser.add_argument("--seed", type=int, default=42, help="request parameters seed")
+    parser.add_argument("--output", help="JSON results file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    run(parser.parse_args())
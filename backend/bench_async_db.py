@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import requests
+
+from bench_api import login, measure
+from seed_synthetic import ADMIN_EMAIL, PASSWORD
+
+# Sync vs async database path: starts the API twice (ASYNC_DB=0, then ASYNC_DB=1)
+# against the same database and measures throughput of the hot endpoints.
+# Needs a database seeded with seed_synthetic.py and aiomysql installed for the
+# async run.
+#   python bench_async_db.py [workers] [seconds_per_scenario]
+
+PORT = 8010
+API_URL = f"http://localhost:{PORT}"
+
+def start_server(async_db):
+    env = dict(os.environ, ASYNC_DB="1" if async_db else "0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT), "--log-level", "warning"],
+        env=env,
+    )
+    for _ in range(100):
+        try:
+            requests.get(f"{API_URL}/", timeout=1)
+            return server
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("Server did not start")
+
+def run_scenarios(workers, seconds):
+    headers = login(API_URL)
+
+    # Plenty of stock so checkouts measure the write path, not 409s
+    product = requests.post(f"{API_URL}/products", headers=headers, json={
+        "name": "Bench Product",
+        "price": 1000,
+        "image_url": "/file.svg",
+        "category": "Bench",
+        "sku": f"BENCH-{uuid.uuid4().hex[:12]}",
+        "stock_quantity": 1_000_000,
+    })
+    product.raise_for_status()
+    product_id = product.json()["id"]
+
+    scenarios = {
+        # include_total=false and varying skip keep the catalog cache from answering everything
+        "list products": lambda s, rng: s.get(f"{API_URL}/products", params={
+            "limit": 20, "skip": rng.randrange(200), "include_total": "false"
+        }).ok,
+        "product detail": lambda s, rng: s.get(f"{API_URL}/products/{product_id}").ok,
+        "login": lambda s, rng: s.post(f"{API_URL}/token", data={"username": ADMIN_EMAIL, "password": PASSWORD}).ok,
+        "checkout": lambda s, rng: s.post(f"{API_URL}/orders", headers=headers, json={
+            "items": [{"product_id": product_id, "quantity": 1}]
+        }).ok,
+    }
+    return [{"scenario": name, **measure(call, workers, seconds)} for name, call in scenarios.items()]
+
+def run(workers=32, seconds=10):
+    results = {}
+    for mode, async_db in (("sync", False), ("async", True)):
+        server = start_server(async_db)
+        try:
+            results[mode] = run_scenarios(workers, seconds)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{workers} concurrent clients, {seconds}s per scenario")
+    print(f"{'scenario':<16}{'sync req/s':>12}{'async req/s':>13}{'speedup':>9}{'sync p95':>10}{'async p95':>11}{'errors':>8}")
+    for sync_row, async_row in zip(results["sync"], results["async"]):
+        speedup = async_row["rps"] / sync_row["rps"] if sync_row["rps"] else 0
+        print(f"{sync_row['scenario']:<16}{sync_row['rps']:>12.1f}{async_row['rps']:>13.1f}{speedup:>8.2f}x"
+              f"{sync_row['p95_ms']:>8.0f}ms{async_row['p95_ms']:>9.0f}ms{sync_row['errors'] + async_row['errors']:>8}")
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -0,0 +1,42 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_api import measure
+from seed_synthetic import ADMIN_EMAIL, PASSWORD
+
+# Login load vs the rest of the API: hammers /token while probing a cheap,
+# unrelated endpoint, and reports login throughput plus the probe's latency
+# with and without the login load. Blocking bcrypt on the event loop shows up
+# as a probe p99 close to the bcrypt time; off-loop hashing keeps it flat.
+# Run against a live server seeded with seed_synthetic.py.
+#   python bench_login.py [login_workers] [seconds]
+
+API_URL = "http://localhost:8000"
+PROBE_URL = f"{API_URL}/" # No database, no hashing
+PROBE_WORKERS = 4
+
+def login(session, rng):
+    return session.post(f"{API_URL}/token", data={"username": ADMIN_EMAIL, "password": PASSWORD}).ok
+
+def probe(session, rng):
+    return session.get(PROBE_URL).ok
+
+def run(login_workers=16, seconds=10):
+    # 1. Baseline: probe alone
+    baseline = measure(probe, PROBE_WORKERS, seconds)
+
+    # 2. Probe while logins run concurrently
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        logins = pool.submit(measure, login, login_workers, seconds)
+        loaded = pool.submit(measure, probe, PROBE_WORKERS, seconds)
+        logins, loaded = logins.result(), loaded.result()
+
+    print(f"{login_workers} login clients, {PROBE_WORKERS} probe clients, {seconds}s per phase")
+    print(f"logins: {(logins['requests'] - logins['errors']) / seconds:.1f}/s ok, {logins['errors']} rejected (429/503), "
+          f"p50 {logins['p50_ms']:.0f}ms, p99 {logins['p99_ms']:.0f}ms")
+    for name, row in (("probe alone", baseline), ("probe under login load", loaded)):
+        print(f"{name:<24} {row['rps']:>8.1f} req/s  p50 {row['p50_ms']:>6.1f}ms  p99 {row['p99_ms']:>6.1f}ms")
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -0,0 +1,96 @@
+import argparse
+import os
+import sys
+import tempfile
+
+# Index check for the hot queries: runs EXPLAIN on each one and fails unless the
+# plan uses the index it was designed for. By default it migrates and seeds a
+# throwaway SQLite database; --url checks an existing, migrated database instead
+# (e.g. a MySQL copy of production, where the planner sees real statistics).
+# test_query_plans.py runs the same checks under pytest.
+#   python check_query_plans.py [--url mysql+pymysql://...]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that the hot queries use their indexes")
+    parser.add_argument("--url", help="migrated database to check (default: fresh seeded SQLite)")
+    args = parser.parse_args()
+
+    # Must be set before app.database is imported
+    os.environ["DATABASE_URL"] = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'query_plans.db')}"
+    os.environ.pop("DATABASE_REPLICA_URLS", None)
+    os.environ["BCRYPT_ROUNDS"] = "4"
+
+from sqlalchemy import text
+
+from app import models, migrations, inventory, pagination
+from app.database import SessionLocal, engine
+
+
+# (description, index it must use, query(db)): built like the endpoints build them
+HOT_QUERIES = [
+    ("category page by price", "ix_products_category_price", lambda db: pagination.order_by(
+        db.query(models.Product).filter(models.Product.category == "Hogar"), "price_asc"
+    ).limit(21)),
+    ("low-stock listing", "ix_products_stock_id", lambda db: inventory.low_stock_query(db).limit(100)),
+    ("a customer's orders", "ix_orders_user_created", lambda db: db.query(models.Order).filter(models.Order.user_id == 2)
+        .order_by(models.Order.created_at.desc(), models.Order.id.desc()).limit(50)),
+    ("items of a page of orders", "ix_order_items_order_id", lambda db: db.query(models.OrderItem)
+        .filter(models.OrderItem.order_id.in_([1, 2, 3]))),
+    ("a product's stock movements", "ix_stock_movements_product_created", lambda db: db.query(models.StockMovement)
+        .filter(models.StockMovement.product_id == 1).order_by(models.StockMovement.created_at.desc()).limit(100)),
+    ("orders in a date range", "ix_orders_created_at", lambda db: db.query(models.Order.id, models.Order.total_amount)
+        .filter(models.Order.created_at >= "2024-12-01", models.Order.created_at < "2024-12-08")),
+]
+
+
+def explain(db, query) -> str:
+    sql = str(query.statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN" if engine.dialect.name == "sqlite" else "EXPLAIN"
+    rows = db.execute(text(f"{prefix} {sql}")).fetchall()
+    return "\n".join(" | ".join(str(value) for value in row) for row in rows)
+
+
+def seed():
+    import seed_synthetic # Uses DATABASE_URL, set above
+
+    seed_synthetic.seed(products=5000, users=500, orders=5000)
+    db = SessionLocal()
+    try:
+        # Some stock movements, which the synthetic orders don't create
+        db.execute(models.StockMovement.__table__.insert(), [
+            {"product_id": i % 500 + 1, "quantity": 1, "movement_type": "IN", "reason": "seed"} for i in range(5000)
+        ])
+        db.execute(text("ANALYZE")) # Planner statistics, as a live database has them
+        db.commit()
+    finally:
+        db.close()
+
+
+def main(url=None):
+    if not url:
+        migrations.migrate(engine)
+        seed()
+    elif migrations.pending(engine):
+        sys.exit("The database has pending migrations: run migrate.py first")
+
+    db = SessionLocal()
+    failures = 0
+    try:
+        for description, index, query in HOT_QUERIES:
+            plan = explain(db, query(db))
+            ok = index in plan
+            failures += not ok
+            print(f"{'ok' if ok else 'FAIL':<4} {description:<30} {index}")
+            if not ok:
+                print("       " + plan.replace("\n", "\n       "))
+    finally:
+        db.close()
+
+    if failures:
+        print(f"\n{failures} queries don't use their index")
+        sys.exit(1)
+    print("\nAll hot queries use their indexes")
+
+
+if __name__ == "__main__":
+    main(args.url)
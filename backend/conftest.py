@@ -0,0 +1,19 @@
+import os
+import tempfile
+
+# Test setup shared by the test_*.py checks, run with pytest (or directly, as
+# scripts, which import this module first). Always a fresh SQLite file, never
+# the configured database; set before the app is imported.
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "tests.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+os.environ["BCRYPT_ROUNDS"] = "4" # Fast hashing for the fixture users
+
+from app import migrations # noqa: E402
+from app.database import engine # noqa: E402
+
+migrations.migrate(engine, log=lambda message: None) # The app never creates tables itself
+
+# Manual scripts: they print instead of asserting, or need a running server
+collect_ignore = ["test_api.py", "test_me_endpoint.py"]
@@ -0,0 +1,69 @@
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench_api import login
+
+# Flash-sale load test: many concurrent checkouts competing for a small stock.
+# Run against a live server (uvicorn app.main:app) seeded with seed_synthetic.py.
+#   python load_test_checkout.py [stock] [checkouts] [workers]
+
+API_URL = "http://localhost:8000"
+
+def run(stock=50, checkouts=200, workers=32):
+    headers = login(API_URL)
+
+    # 1. Product with a known, small stock
+    product = requests.post(f"{API_URL}/products", headers=headers, json={
+        "name": "Load Test Product",
+        "price": 1000,
+        "image_url": "/file.svg",
+        "category": "LoadTest",
+        "sku": f"LOAD-{uuid.uuid4().hex[:12]}",
+        "stock_quantity": stock,
+    })
+    product.raise_for_status()
+    product_id = product.json()["id"]
+    print(f"Product {product_id} created with stock {stock}")
+
+    # 2. Fire concurrent checkouts of one unit each
+    def checkout(_):
+        res = requests.post(f"{API_URL}/orders", headers=headers, json={
+            "items": [{"product_id": product_id, "quantity": 1}]
+        })
+        return res.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        statuses = list(pool.map(checkout, range(checkouts)))
+    elapsed = time.perf_counter() - started
+
+    succeeded = statuses.count(200)
+    rejected = statuses.count(409)
+    print(f"{checkouts} checkouts in {elapsed:.2f}s ({checkouts / elapsed:.1f} req/s): "
+          f"{succeeded} ok, {rejected} out of stock, {len(statuses) - succeeded - rejected} other")
+
+    # 3. Verify: no overselling and no lost updates
+    final_stock = requests.get(f"{API_URL}/products/{product_id}").json()["stock_quantity"]
+    # /inventory/movements returns the latest 100 rows: keep stock <= 100
+    movements = requests.get(f"{API_URL}/inventory/movements", headers=headers,
+                             params={"product_id": product_id}).json()
+    out_units = sum(m["quantity"] for m in movements if m["movement_type"] == "OUT")
+
+    checks = {
+        "sold exactly the available stock": succeeded == min(stock, checkouts),
+        "final stock matches sales": final_stock == stock - succeeded,
+        "one OUT movement per unit sold": out_units == succeeded,
+        "no unexpected errors": succeeded + rejected == checkouts,
+    }
+    for name, ok in checks.items():
+        print(f"{'PASS' if ok else 'FAIL'}: {name}")
+    print(f"Final stock: {final_stock}, OUT units: {out_units}")
+    return all(checks.values())
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:4]]
+    sys.exit(0 if run(*args) else 1)
@@ -0,0 +1,26 @@
+import argparse
+
+from app import migrations
+from app.database import engine
+
+# Applies the versioned schema migrations in migrations/ to DATABASE_URL.
+#   python migrate.py             apply everything pending
+#   python migrate.py --to 2      apply up to version 2
+#   python migrate.py --status    list applied and pending versions
+
+def status():
+    applied = migrations.applied_versions(engine)
+    for migration in migrations.discover():
+        state = "applied" if migration.version in applied else "pending"
+        print(f"{migration.version:04d}  {state:<8} {migration.name}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument("--to", type=int, help="last version to apply")
+    parser.add_argument("--status", action="store_true", help="only list migrations")
+    args = parser.parse_args()
+    if args.status:
+        status()
+    else:
+        done = migrations.migrate(engine, target=args.to)
+        print(f"Applied {len(done)} migration(s)." if done else "Database is up to date.")
@@ -0,0 +1,131 @@
+from sqlalchemy import JSON, Boolean, Column, Date, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, Text
+
+from app.migrations import add_column
+
+# Baseline: the schema as of the move to versioned migrations, frozen here so
+# later changes to app/models.py don't change what 0001 creates. Missing tables
+# are created; databases from before then also get the columns the old one-off
+# migrate_*.py scripts added. Indexes added later come from their migrations.
+
+metadata = MetaData()
+
+Table(
+    "products", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(255), index=True),
+    Column("description", Text),
+    Column("price", Float),
+    Column("image_url", String(255)),
+    Column("category", String(100), index=True),
+    Column("sku", String(50), unique=True, index=True, nullable=True),
+    Column("stock_quantity", Integer),
+    Column("min_stock", Integer),
+    Column("cost_price", Float),
+    Column("supplier", String(100), nullable=True),
+)
+
+Table(
+    "stock_movements", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("product_id", Integer, ForeignKey("products.id")),
+    Column("quantity", Integer),
+    Column("movement_type", String(20)),
+    Column("reason", String(255)),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("email", String(255), unique=True, index=True),
+    Column("hashed_password", String(255)),
+    Column("is_active", Integer),
+    Column("is_admin", Boolean),
+    Column("created_at", DateTime),
+    Column("last_login", DateTime, nullable=True),
+    Column("phone", String(50), nullable=True),
+    Column("address", String(255), nullable=True),
+)
+
+Table(
+    "orders", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("total_amount", Float),
+    Column("status", String(50)),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "order_items", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("order_id", Integer, ForeignKey("orders.id")),
+    Column("product_id", Integer, ForeignKey("products.id")),
+    Column("quantity", Integer),
+    Column("price", Float),
+)
+
+Table(
+    "customer_metrics", metadata,
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("total_spent", Float, index=True),
+    Column("orders_count", Integer, index=True),
+    Column("first_order_at", DateTime, nullable=True),
+    Column("last_order_at", DateTime, nullable=True),
+    Column("tags", String(100)),
+    Column("ltv_score", Integer),
+    Column("updated_at", DateTime),
+)
+
+Table(
+    "sales_daily", metadata,
+    Column("day", Date, primary_key=True),
+    Column("slot", Integer, primary_key=True),
+    Column("revenue", Float),
+    Column("orders_count", Integer),
+)
+
+Table(
+    "sales_daily_category", metadata,
+    Column("day", Date, primary_key=True),
+    Column("category", String(100), primary_key=True),
+    Column("slot", Integer, primary_key=True),
+    Column("revenue", Float),
+    Column("units", Integer),
+)
+
+Table(
+    "jobs", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("kind", String(50), index=True),
+    Column("status", String(20), index=True),
+    Column("params", JSON, nullable=True),
+    Column("progress", Integer),
+    Column("result", JSON, nullable=True),
+    Column("error", Text, nullable=True),
+    Column("created_by", Integer, ForeignKey("users.id"), nullable=True),
+    Column("created_at", DateTime),
+    Column("started_at", DateTime, nullable=True),
+    Column("finished_at", DateTime, nullable=True),
+    Column("updated_at", DateTime),
+)
+
+LEGACY_COLUMNS = [
+    ("users", "is_admin", "BOOLEAN DEFAULT 0"),
+    ("users", "created_at", "DATETIME NULL"), # Filled in by the app (SQLite rejects non-constant defaults here)
+    ("users", "last_login", "DATETIME NULL"),
+    ("users", "phone", "VARCHAR(50) NULL"),
+    ("users", "address", "VARCHAR(255) NULL"),
+    ("products", "sku", "VARCHAR(50) NULL"),
+    ("products", "stock_quantity", "INTEGER DEFAULT 0"),
+    ("products", "min_stock", "INTEGER DEFAULT 5"),
+    ("products", "cost_price", "FLOAT DEFAULT 0.0"),
+    ("products", "supplier", "VARCHAR(100) NULL"),
+]
+
+
+def upgrade(conn):
+    metadata.create_all(bind=conn, checkfirst=True)
+    for table, column, definition in LEGACY_COLUMNS:
+        if add_column(conn, table, column, definition):
+            print(f"  added {table}.{column}")
@@ -0,0 +1,20 @@
+from app.migrations import create_index
+
+# Composite indexes for the hot listing queries (see check_query_plans.py):
+# category pages sorted by price, the low-stock listing, a customer's orders,
+# the items of a page of orders and a product's stock movements.
+
+INDEXES = [
+    ("products", "ix_products_category_price", ("category", "price")),
+    ("products", "ix_products_stock_id", ("stock_quantity", "id")),
+    ("orders", "ix_orders_user_created", ("user_id", "created_at")),
+    ("orders", "ix_orders_created_at", ("created_at",)),
+    ("order_items", "ix_order_items_order_id", ("order_id",)),
+    ("stock_movements", "ix_stock_movements_product_created", ("product_id", "created_at")),
+]
+
+
+def upgrade(conn):
+    for table, name, columns in INDEXES:
+        if create_index(conn, table, name, *columns):
+            print(f"  created {name}")
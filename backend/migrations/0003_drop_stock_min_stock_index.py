@@ -0,0 +1,10 @@
+from app.migrations import drop_index
+
+# ix_products_stock_min_stock (from migrate_inventory.py and 0001) can't serve
+# stock_quantity <= min_stock, a comparison of two columns: the low-stock
+# listing uses ix_products_stock_id. It only cost a write on every stock UPDATE.
+
+
+def upgrade(conn):
+    if drop_index(conn, "products", "ix_products_stock_min_stock"):
+        print("  dropped ix_products_stock_min_stock")
@@ -0,0 +1,85 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table, func, select
+
+# Fills customer_metrics from the order history on databases that had orders
+# before the rollup existed (replaces migrate_customer_metrics.py). Runs once
+# per database, like every migration, and always rebuilds: rows written by
+# signups or checkouts before it ran say nothing about the older orders.
+# The tables and the tag / LTV rules are frozen here as they were when the
+# rollup was introduced, so later changes to app/ don't change this migration.
+# The app refuses to start while it is pending: nothing writes concurrently.
+
+BATCH_SIZE = 1000
+VIP_MIN_SPENT = 100000
+FREQUENT_MIN_ORDERS = 6
+LTV_SPENT_PER_POINT = 5000
+
+metadata = MetaData()
+users = Table("users", metadata, Column("id", Integer, primary_key=True))
+orders = Table(
+    "orders", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer),
+    Column("total_amount", Float),
+    Column("created_at", DateTime),
+)
+customer_metrics = Table(
+    "customer_metrics", metadata,
+    Column("user_id", Integer, primary_key=True),
+    Column("total_spent", Float),
+    Column("orders_count", Integer),
+    Column("first_order_at", DateTime),
+    Column("last_order_at", DateTime),
+    Column("tags", String(100)),
+    Column("ltv_score", Integer),
+    Column("updated_at", DateTime),
+)
+
+
+def tags(total_spent, orders_count) -> str:
+    return ",".join(tag for tag, applies in (
+        ("VIP", total_spent > VIP_MIN_SPENT),
+        ("Frecuente", orders_count >= FREQUENT_MIN_ORDERS),
+        ("Nuevo", orders_count == 0),
+    ) if applies)
+
+
+def upgrade(conn):
+    conn.execute(customer_metrics.delete())
+    now = datetime.utcnow()
+    done = 0
+    last_user_id = 0
+    while True:
+        user_ids = conn.execute(
+            select(users.c.id).where(users.c.id > last_user_id).order_by(users.c.id).limit(BATCH_SIZE)
+        ).scalars().all()
+        if not user_ids:
+            break
+        last_user_id = user_ids[-1]
+        totals = {row.user_id: row for row in conn.execute(select(
+            orders.c.user_id,
+            func.coalesce(func.sum(orders.c.total_amount), 0).label("total_spent"),
+            func.count(orders.c.id).label("orders_count"),
+            func.min(orders.c.created_at).label("first_order_at"),
+            func.max(orders.c.created_at).label("last_order_at"),
+        ).where(orders.c.user_id.in_(user_ids)).group_by(orders.c.user_id))}
+        rows = []
+        for user_id in user_ids:
+            row = totals.get(user_id)
+            total_spent = float(row.total_spent) if row else 0.0
+            orders_count = row.orders_count if row else 0
+            rows.append({
+                "user_id": user_id,
+                "total_spent": total_spent,
+                "orders_count": orders_count,
+                "first_order_at": row.first_order_at if row else None,
+                "last_order_at": row.last_order_at if row else None,
+                "tags": tags(total_spent, orders_count),
+                "ltv_score": min(int(total_spent / LTV_SPENT_PER_POINT), 100),
+                "updated_at": now,
+            })
+        conn.execute(customer_metrics.insert(), rows)
+        done += len(user_ids)
+        print(f"  {done} users processed")
+    print(f"  customer metrics rebuilt for {done} users")
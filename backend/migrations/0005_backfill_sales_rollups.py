@@ -0,0 +1,91 @@
+from datetime import date, datetime
+
+from sqlalchemy import Column, Date, DateTime, Float, Integer, MetaData, String, Table, func, select
+
+# Fills sales_daily / sales_daily_category from the order history on databases
+# that had orders before the rollups existed (replaces migrate_sales_rollups.py).
+# Always rebuilds, whatever checkouts already wrote. Later repairs of a date
+# range: POST /admin/jobs rebuild_sales_rollups.
+# The tables are frozen here as they were when the rollups were introduced, so
+# later changes to app/ don't change this migration. The app refuses to start
+# while it is pending: nothing writes concurrently, so every row is replaced.
+
+REBUILD_SLOT = 8 # Slot of rebuilt history, never written by checkouts
+
+metadata = MetaData()
+products = Table("products", metadata, Column("id", Integer, primary_key=True), Column("category", String(100)))
+orders = Table(
+    "orders", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("total_amount", Float),
+    Column("created_at", DateTime),
+)
+order_items = Table(
+    "order_items", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("order_id", Integer),
+    Column("product_id", Integer),
+    Column("quantity", Integer),
+    Column("price", Float),
+)
+sales_daily = Table(
+    "sales_daily", metadata,
+    Column("day", Date, primary_key=True),
+    Column("slot", Integer, primary_key=True),
+    Column("revenue", Float),
+    Column("orders_count", Integer),
+)
+sales_daily_category = Table(
+    "sales_daily_category", metadata,
+    Column("day", Date, primary_key=True),
+    Column("category", String(100), primary_key=True),
+    Column("slot", Integer, primary_key=True),
+    Column("revenue", Float),
+    Column("units", Integer),
+)
+
+
+def as_date(value) -> date:
+    # func.date() returns a string on SQLite and a date on MySQL
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def upgrade(conn):
+    conn.execute(sales_daily.delete())
+    conn.execute(sales_daily_category.delete())
+    order_day = func.date(orders.c.created_at)
+
+    daily = conn.execute(select(
+        order_day.label("day"),
+        func.coalesce(func.sum(orders.c.total_amount), 0).label("revenue"),
+        func.count(orders.c.id).label("orders_count"),
+    ).group_by(order_day)).all()
+    if daily:
+        conn.execute(sales_daily.insert(), [
+            {"day": as_date(row.day), "slot": REBUILD_SLOT, "revenue": float(row.revenue), "orders_count": row.orders_count}
+            for row in daily
+        ])
+
+    # Products without category may collapse into the same "" row
+    by_category = {}
+    for row in conn.execute(select(
+        order_day.label("day"),
+        products.c.category,
+        func.sum(order_items.c.price * order_items.c.quantity).label("revenue"),
+        func.sum(order_items.c.quantity).label("units"),
+    ).select_from(
+        order_items.join(orders, order_items.c.order_id == orders.c.id).join(products, order_items.c.product_id == products.c.id)
+    ).group_by(order_day, products.c.category)):
+        key = (as_date(row.day), row.category or "")
+        revenue, units = by_category.get(key, (0.0, 0))
+        by_category[key] = (revenue + float(row.revenue or 0), units + int(row.units or 0))
+    if by_category:
+        conn.execute(sales_daily_category.insert(), [
+            {"day": day, "category": category, "slot": REBUILD_SLOT, "revenue": revenue, "units": units}
+            for (day, category), (revenue, units) in by_category.items()
+        ])
+    print(f"  sales rollups rebuilt for {len(daily)} days")
@@ -0,0 +1,19 @@
+from sqlalchemy import JSON, Column, DateTime, MetaData, String, Table
+
+# Stored responses of POST /orders and /inventory/movements requests made with
+# an Idempotency-Key header (see app/idempotency.py).
+
+metadata = MetaData()
+
+Table(
+    "idempotency_keys", metadata,
+    Column("key", String(64), primary_key=True),
+    Column("fingerprint", String(64)),
+    Column("response", JSON, nullable=True),
+    Column("locked_until", DateTime, nullable=True),
+    Column("expires_at", DateTime, index=True),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(bind=conn, checkfirst=True)
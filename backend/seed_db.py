@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
 from app.database import SessionLocal, engine
-from app import models
+from app import models, migrations
 
 def seed_db():
     db = SessionLocal()
@@ -36,5 +36,5 @@ def seed_db():
 
 if __name__ == "__main__":
     # Ensure tables exist
-    models.Base.metadata.create_all(bind=engine)
+    migrations.migrate(engine)
     seed_db()
@@ -0,0 +1,158 @@
+import argparse
+import random
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert
+
+from app import models, auth, customer_metrics, analytics, migrations
+from app.database import SessionLocal, engine
+
+# Synthetic dataset for benchmarks: a catalog, customers and an order history at
+# any scale, written to the configured DATABASE_URL (SQLite or MySQL) with
+# batched INSERTs. The same --seed always produces the same data, so runs of
+# bench_api.py on different commits compare like with like. Needs an empty
+# database; the customer and sales rollups are rebuilt from the orders at the end.
+#   python seed_synthetic.py --products 100000 --users 50000 --orders 1000000
+
+ADMIN_EMAIL = "bench-admin@example.com"
+PASSWORD = "bench123" # Admin and every customer
+CUSTOMER_EMAIL = "customer{}@bench.local" # customer1 .. customerN
+BATCH_SIZE = 10_000
+SEED_NOW = datetime(2025, 1, 1) # Fixed, so dates don't depend on when the seed ran; history ends here
+
+CATEGORIES = ["Ropa", "Hogar", "Accesorios", "Electronica", "Deportes", "Juguetes", "Libros", "Belleza", "Jardin", "Mascotas"]
+NOUNS = ["Camiseta", "Pantalon", "Lampara", "Mesa", "Silla", "Reloj", "Mochila", "Audifonos", "Teclado", "Pelota",
+         "Zapatilla", "Chaqueta", "Cojin", "Taza", "Libro", "Perfume", "Maceta", "Collar", "Cargador", "Botella"]
+ADJECTIVES = ["Clasico", "Moderno", "Deportivo", "Premium", "Compacto", "Ligero", "Elegante", "Resistente",
+              "Vintage", "Ecologico", "Inalambrico", "Infantil", "Grande", "Mini", "Profesional"]
+WORDS = ["calidad", "diseno", "comodo", "algodon", "madera", "metal", "uso", "diario", "ideal", "regalo",
+         "facil", "limpiar", "garantia", "color", "negro", "blanco", "azul", "talla", "unica", "durable"]
+
+
+def batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write(db, model, rows, total, label):
+    started = time.perf_counter()
+    done = 0
+    for batch in batches(rows):
+        db.execute(insert(model), batch)
+        db.commit()
+        done += len(batch)
+        print(f"\r{label}: {done}/{total}", end="", flush=True)
+    print(f"\r{label}: {done} in {time.perf_counter() - started:.1f}s")
+
+
+def product_rows(rng, count, prices):
+    for product_id in range(1, count + 1):
+        price = max(1, round(min(rng.lognormvariate(3.5, 0.9), 2000))) - 0.01 # Shelf prices: 33.99
+        prices.append(price)
+        roll = rng.random()
+        stock = 0 if roll < 0.1 else rng.randint(1, 5) if roll < 0.25 else rng.randint(6, 500)
+        yield {
+            "id": product_id,
+            "name": f"{rng.choice(NOUNS)} {rng.choice(ADJECTIVES)} {product_id}",
+            "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(15, 50))),
+            "price": price,
+            "image_url": "/file.svg",
+            "category": rng.choice(CATEGORIES),
+            "sku": f"SYN-{product_id:08d}",
+            "stock_quantity": stock,
+            "min_stock": 5,
+            "cost_price": round(price * 0.6, 2),
+        }
+
+
+def user_rows(rng, count, now, days, hashed):
+    yield {"id": 1, "email": ADMIN_EMAIL, "hashed_password": hashed, "is_active": 1, "is_admin": True, "created_at": now - timedelta(days=days)}
+    for i in range(1, count + 1):
+        yield {
+            "id": i + 1,
+            "email": CUSTOMER_EMAIL.format(i),
+            "hashed_password": hashed,
+            "is_active": 1,
+            "is_admin": False,
+            "created_at": now - timedelta(seconds=rng.randrange(days * 86400)),
+        }
+
+
+def order_rows(rng, count, users, products, items_per_order, now, days, prices, items):
+    # Orders and their items are generated together; items go to the items list
+    # and are written right after each batch of orders
+    for order_id in range(1, count + 1):
+        # Skewed: a few customers and products account for most orders, as in a real shop
+        user_id = 2 + int(users * rng.random() ** 2)
+        total = 0.0
+        for _ in range(rng.randint(1, items_per_order * 2 - 1)):
+            product_id = 1 + int(products * rng.random() ** 3)
+            quantity = rng.choice((1, 1, 1, 2, 3))
+            price = prices[product_id - 1]
+            total += price * quantity
+            items.append({"order_id": order_id, "product_id": product_id, "quantity": quantity, "price": price})
+        yield {
+            "id": order_id,
+            "user_id": user_id,
+            "total_amount": round(total, 2),
+            "status": "completed",
+            "created_at": now - timedelta(seconds=rng.randrange(days * 86400)),
+        }
+
+
+def seed(products=10_000, users=5_000, orders=50_000, items_per_order=3, days=365, seed_value=42):
+    migrations.migrate(engine)
+    db = SessionLocal()
+    try:
+        existing = db.query(func.count(models.Product.id)).scalar() + db.query(func.count(models.Order.id)).scalar()
+        if existing:
+            sys.exit("The database already has products or orders: seed a fresh one so results are reproducible")
+
+        rng = random.Random(seed_value)
+        now = SEED_NOW
+        prices = array("d")
+        started = time.perf_counter()
+
+        write(db, models.Product, product_rows(rng, products, prices), products, "products")
+        write(db, models.User, user_rows(rng, users, now, days, auth.get_password_hash(PASSWORD)), users + 1, "users")
+
+        order_started = time.perf_counter()
+        items = []
+        item_count = 0
+        for done, batch in enumerate(batches(order_rows(rng, orders, users, products, items_per_order, now, days, prices, items)), 1):
+            db.execute(insert(models.Order), batch)
+            db.execute(insert(models.OrderItem), items)
+            db.commit()
+            item_count += len(items)
+            items.clear()
+            print(f"\rorders: {min(done * BATCH_SIZE, orders)}/{orders}", end="", flush=True)
+        print(f"\rorders: {orders} ({item_count} items) in {time.perf_counter() - order_started:.1f}s")
+
+        rollup_started = time.perf_counter()
+        rebuilt_users = customer_metrics.rebuild_customer_metrics(db)
+        rebuilt_days = analytics.rebuild_sales_rollups(db)
+        print(f"rollups: {rebuilt_users} customers, {rebuilt_days} days in {time.perf_counter() - rollup_started:.1f}s")
+        print(f"Done in {time.perf_counter() - started:.1f}s. Admin: {ADMIN_EMAIL} / {PASSWORD}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed a synthetic catalog and order history")
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--orders", type=int, default=50_000)
+    parser.add_argument("--items-per-order", type=int, default=3, help="average lines per order")
+    parser.add_argument("--days", type=int, default=365, help="order history length")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    seed(args.products, args.users, args.orders, args.items_per_order, args.days, args.seed)
@@ -0,0 +1,175 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import conftest # noqa: F401 (throwaway database, before the app is imported)
+
+# Idempotency-Key checks for POST /orders and /inventory/movements: retries
+# replay the first response, concurrent duplicates run the order once, and a
+# key reused with another body is rejected.
+#   pytest test_idempotency.py
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.database import SessionLocal
+from app import models, schemas, auth, orders, idempotency
+
+
+@pytest.fixture(scope="module")
+def shop():
+    db = SessionLocal()
+    db.add(models.User(email="idempotency@test.com", hashed_password=auth.get_password_hash("pw"), is_admin=True, is_active=True))
+    db.commit()
+    db.close()
+    client = TestClient(app)
+    token = client.post("/token", data={"username": "idempotency@test.com", "password": "pw"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    res = client.post("/products", headers=headers, json={
+        "name": "Idempotent Product", "price": 10, "image_url": "x", "category": "General", "stock_quantity": 1000,
+    })
+    assert res.status_code == 200, res.text
+    return client, headers, res.json()["id"]
+
+
+def count_orders() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(models.Order).count()
+    finally:
+        db.close()
+
+
+def checkout(shop, key, quantity=1):
+    client, headers, product_id = shop
+    return client.post("/orders", headers={**headers, "Idempotency-Key": key}, json={
+        "items": [{"product_id": product_id, "quantity": quantity}],
+    })
+
+
+@pytest.fixture
+def slow_checkout(monkeypatch):
+    # place_order that takes a while, as under load; returns how many times it ran
+    calls = []
+    place_order = orders.place_order
+    def slow(*args, **kwargs):
+        calls.append(1)
+        time.sleep(0.5)
+        return place_order(*args, **kwargs)
+    monkeypatch.setattr(orders, "place_order", slow)
+    return calls
+
+
+def test_retry_replays_the_first_response(shop):
+    before = count_orders()
+    first = checkout(shop, "replay")
+    retry = checkout(shop, "replay")
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert count_orders() == before + 1
+
+
+def test_key_reused_with_another_body_is_rejected(shop):
+    assert checkout(shop, "mismatch", quantity=1).status_code == 200
+    res = checkout(shop, "mismatch", quantity=2)
+    assert res.status_code == 422
+    assert "different request" in res.json()["detail"]
+
+
+def test_requests_without_a_key_are_not_deduplicated(shop):
+    client, headers, product_id = shop
+    before = count_orders()
+    for _ in range(2):
+        res = client.post("/orders", headers=headers, json={"items": [{"product_id": product_id, "quantity": 1}]})
+        assert res.status_code == 200
+    assert count_orders() == before + 2
+
+
+def test_invalid_key_is_rejected(shop):
+    assert checkout(shop, "x" * (idempotency.MAX_KEY_LENGTH + 1)).status_code == 400
+
+
+def test_concurrent_duplicates_wait_for_the_first(shop, slow_checkout):
+    before = count_orders()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(checkout(shop, "concurrent"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [res.status_code for res in results] == [200] * 5
+    assert len({res.json()["id"] for res in results}) == 1
+    assert len(slow_checkout) == 1
+    assert count_orders() == before + 1
+
+
+def test_claim_outlives_the_lock_ttl_while_running(shop, slow_checkout, monkeypatch):
+    # A commit slower than IDEMPOTENCY_LOCK_TTL keeps its claim: the duplicate waits instead of running
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_LOCK_TTL", 0.2)
+    before = count_orders()
+    results = []
+    first = threading.Thread(target=lambda: results.append(checkout(shop, "slow-commit")))
+    first.start()
+    time.sleep(0.35)
+    duplicate = checkout(shop, "slow-commit")
+    first.join()
+    assert duplicate.status_code == 200 and duplicate.json() == results[0].json()
+    assert len(slow_checkout) == 1
+    assert count_orders() == before + 1
+
+
+def test_stale_claim_is_taken_over(shop):
+    # The worker that claimed the key died: after the lock expires a retry runs the order
+    client, headers, product_id = shop
+    user_id = client.get("/users/me", headers=headers).json()["id"]
+    payload = schemas.OrderCreate(items=[{"product_id": product_id, "quantity": 1}])
+    claim = idempotency.Claim("orders", user_id, "stale", payload)
+    assert claim.attempt() is True
+    db = SessionLocal()
+    db.query(models.IdempotencyKey).filter(models.IdempotencyKey.key == claim.key).update(
+        {"locked_until": datetime.utcnow() - timedelta(seconds=1)}, synchronize_session=False
+    )
+    db.commit()
+    db.close()
+    before = count_orders()
+    assert checkout(shop, "stale").status_code == 200
+    assert count_orders() == before + 1
+
+
+def test_failed_request_releases_the_key(shop):
+    assert checkout(shop, "out-of-stock", quantity=10_000).status_code == 409
+    assert checkout(shop, "out-of-stock", quantity=10_000).status_code == 409 # Ran again, not replayed
+
+
+def test_stock_movement_is_applied_once(shop):
+    client, headers, product_id = shop
+    stock = client.get(f"/products/{product_id}").json()["stock_quantity"]
+    body = {"product_id": product_id, "quantity": 5, "movement_type": "IN"}
+    first = client.post("/inventory/movements", headers={**headers, "Idempotency-Key": "movement"}, json=body)
+    retry = client.post("/inventory/movements", headers={**headers, "Idempotency-Key": "movement"}, json=body)
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert client.get(f"/products/{product_id}").json()["stock_quantity"] == stock + 5
+
+
+def test_order_and_stored_response_commit_together(shop, monkeypatch):
+    # Storing the response fails: the order is rolled back with it, so a retry places exactly one
+    _, headers, product_id = shop
+    failing_client = TestClient(app, raise_server_exceptions=False)
+    def fail(self, db, result, model):
+        raise RuntimeError("response not stored")
+    with monkeypatch.context() as patch:
+        patch.setattr(idempotency.Claim, "complete", fail)
+        before = count_orders()
+        res = failing_client.post("/orders", headers={**headers, "Idempotency-Key": "atomic"}, json={
+            "items": [{"product_id": product_id, "quantity": 1}],
+        })
+        assert res.status_code == 500
+        assert count_orders() == before
+    assert checkout(shop, "atomic").status_code == 200
+    assert checkout(shop, "atomic").headers["Idempotent-Replayed"] == "true"
+    assert count_orders() == before + 1
@@ -0,0 +1,117 @@
+import sys
+
+import pytest
+
+import conftest # noqa: F401 (throwaway database, before the app is imported)
+
+# Query-count regression check: seeds a throwaway SQLite database, calls each
+# endpoint and compares the number of SQL statements it ran against a budget.
+# The budgets don't depend on how many rows a response has, so a lazy load per
+# order / item / movement (N+1) pushes the count over and fails the check.
+#   pytest test_query_counts.py    (or: python test_query_counts.py)
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.main import app
+from app.database import SessionLocal, engine
+from app import models, auth, catalog
+
+ORDERS = 6
+ITEMS_PER_ORDER = 3
+
+# Statements per request; the user behind the token is already cached
+BUDGETS = {
+    "GET /orders": 4, # count, orders, items (IN), products (IN)
+    "GET /orders?skip=2&limit=2": 4,
+    "GET /inventory/movements": 1, # movements joined with their products
+    "GET /products": 2, # count, page (catalog cache cold)
+    "GET /products?facets=true": 3, # + facet index rebuild (counts never GROUP BY)
+    "GET /products/{product}": 1, # A seeded product's id
+}
+
+statements = []
+event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+
+def seed(client):
+    db = SessionLocal()
+    db.add(models.User(email="query-counts@test.com", hashed_password=auth.get_password_hash("pw"), is_admin=True, is_active=True))
+    db.commit()
+    db.close()
+    admin = {"Authorization": "Bearer " + client.post("/token", data={"username": "query-counts@test.com", "password": "pw"}).json()["access_token"]}
+
+    product_ids = []
+    for i in range(ITEMS_PER_ORDER * 2):
+        res = client.post("/products", headers=admin, json={
+            "name": f"Product {i}", "description": "x", "price": 10 + i, "image_url": "x",
+            "category": "General", "stock_quantity": 100,
+        })
+        assert res.status_code == 200, res.text
+        product_ids.append(res.json()["id"])
+    for i in range(ORDERS):
+        items = [{"product_id": product_ids[(i + n) % len(product_ids)], "quantity": 1} for n in range(ITEMS_PER_ORDER)]
+        res = client.post("/orders", headers=admin, json={"items": items})
+        assert res.status_code == 200, res.text
+    client.get("/users/me", headers=admin) # Warm the user cache
+    return admin, product_ids
+
+
+def count_queries(client, request, headers, product_ids):
+    method, path = request.format(product=product_ids[0]).split(" ", 1)
+    catalog.invalidate() # Measure the database path, not the catalog cache
+    statements.clear()
+    res = client.request(method, path, headers=headers)
+    assert res.status_code == 200, f"{request}: {res.status_code} {res.text}"
+    return len(statements), res
+
+
+def report(request, budget, count) -> bool:
+    ok = count <= budget
+    print(f"{'ok' if ok else 'FAIL':<4} {request:<32} {count} queries (budget {budget})")
+    if not ok:
+        for statement in statements:
+            print("       " + " ".join(statement.split())[:120])
+    return ok
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    client = TestClient(app)
+    admin, product_ids = seed(client)
+    return client, admin, product_ids
+
+
+@pytest.mark.parametrize("request_line, budget", BUDGETS.items())
+def test_query_budget(seeded, request_line, budget):
+    client, admin, product_ids = seeded
+    count, _ = count_queries(client, request_line, admin, product_ids)
+    assert report(request_line, budget, count), f"{request_line}: {count} queries, budget {budget}"
+
+
+def test_orders_pagination(seeded):
+    # Pagination returns the requested page and the full count
+    client, admin, product_ids = seeded
+    _, res = count_queries(client, "GET /orders?skip=2&limit=2", admin, product_ids)
+    assert len(res.json()) == 2 and res.headers["X-Total-Count"] == str(ORDERS), res.text
+    assert all(len(order["items"]) == ITEMS_PER_ORDER for order in res.json())
+
+
+def main():
+    client = TestClient(app)
+    admin, product_ids = seed(client)
+
+    failures = [
+        request for request, budget in BUDGETS.items()
+        if not report(request, budget, count_queries(client, request, admin, product_ids)[0])
+    ]
+    test_orders_pagination((client, admin, product_ids))
+
+    if failures:
+        print(f"\n{len(failures)} endpoint(s) over budget")
+        sys.exit(1)
+    print("\nAll endpoints within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import conftest # noqa: F401 (throwaway database, before the app is imported)
+
+# Index check for the hot queries (check_query_plans.py) under pytest: EXPLAIN
+# each one against the throwaway database, once it has enough rows and planner
+# statistics for the indexes to matter.
+#   pytest test_query_plans.py    (or, against any database: python check_query_plans.py)
+
+from sqlalchemy import insert, text
+
+from app.database import SessionLocal
+from app import models
+from check_query_plans import HOT_QUERIES, explain
+from seed_synthetic import CATEGORIES
+
+ROWS = 5000
+
+
+@pytest.fixture(scope="module")
+def db():
+    # Rows without explicit ids: the throwaway database is shared with the other tests
+    rng = random.Random(42)
+    now = datetime(2025, 1, 1)
+    db = SessionLocal()
+    db.execute(insert(models.User), [{"email": f"query-plans{i}@test.com", "hashed_password": "x", "is_active": 1} for i in range(100)])
+    user_ids = [row.id for row in db.query(models.User.id)]
+    db.execute(insert(models.Product), [{
+        "name": f"Plan Product {i}", "price": rng.randint(1, 500), "image_url": "x", "category": rng.choice(CATEGORIES),
+        "stock_quantity": rng.randint(0, 100), "min_stock": 5,
+    } for i in range(ROWS)])
+    product_ids = [row.id for row in db.query(models.Product.id)]
+    db.execute(insert(models.Order), [{
+        "user_id": rng.choice(user_ids), "total_amount": 10, "status": "completed",
+        "created_at": now - timedelta(seconds=rng.randrange(365 * 86400)),
+    } for _ in range(ROWS)])
+    order_ids = [row.id for row in db.query(models.Order.id)]
+    db.execute(insert(models.OrderItem), [
+        {"order_id": rng.choice(order_ids), "product_id": rng.choice(product_ids), "quantity": 1, "price": 10} for _ in range(ROWS)
+    ])
+    db.execute(insert(models.StockMovement), [
+        {"product_id": rng.choice(product_ids[:500]), "quantity": 1, "movement_type": "IN", "reason": "seed"} for _ in range(ROWS)
+    ])
+    db.execute(text("ANALYZE")) # Planner statistics, as a live database has them
+    db.commit()
+    yield db
+    db.close()
+
+
+@pytest.mark.parametrize("description, index, query", HOT_QUERIES, ids=[row[0] for row in HOT_QUERIES])
+def test_query_uses_its_index(db, description, index, query):
+    plan = explain(db, query(db))
+    assert index in plan, f"{description}: expected {index}\n{plan}"
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+import conftest # noqa: F401 (throwaway database, before the app is imported)
+
+# Product search: pages of ranked hits, and products written by another
+# process (straight to the database, bypassing this process's index) becoming
+# searchable after the periodic rebuild.
+#   pytest test_search.py
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.database import SessionLocal
+from app import models, search, cache
+
+
+@pytest.fixture(scope="module")
+def client():
+    db = SessionLocal()
+    db.add_all([
+        models.Product(name=f"Searchable Lamp {i}", description="desk lamp", price=10 + i, image_url="x",
+                       category="Lamps" if i % 2 else "Lighting", stock_quantity=i % 3)
+        for i in range(25)
+    ])
+    db.commit()
+    db.close()
+    return TestClient(app)
+
+
+def ids(res) -> list[int]:
+    assert res.status_code == 200, res.text
+    return [item["id"] for item in res.json()["items"]]
+
+
+def test_pages_follow_the_ranking(client):
+    db = SessionLocal()
+    search.get_search_engine().ensure_ready(db)
+    db.close()
+    ranked = [product_id for product_id, _ in search.get_search_engine().search("lamp")]
+    first = client.get("/products", params={"q": "lamp", "limit": 10}).json()
+    assert [item["id"] for item in first["items"]] == ranked[:10]
+    assert first["total"] == len(ranked) and first["has_more"]
+    second = client.get("/products", params={"q": "lamp", "limit": 10, "cursor": first["next_cursor"]})
+    assert ids(second) == ranked[10:20]
+    assert ids(client.get("/products", params={"q": "lamp", "limit": 10, "skip": 20})) == ranked[20:30]
+
+
+def test_filters_still_apply(client):
+    lamps = ids(client.get("/products", params={"q": "lamp", "category": "Lamps", "limit": 100}))
+    assert lamps and len(lamps) < 25
+    db = SessionLocal()
+    try:
+        assert {p.category for p in db.query(models.Product).filter(models.Product.id.in_(lamps))} == {"Lamps"}
+    finally:
+        db.close()
+
+
+def test_other_process_writes_become_searchable(client, monkeypatch):
+    db = SessionLocal()
+    product = models.Product(name="Quokka Plush", price=5, image_url="x", category="Toys", stock_quantity=1)
+    db.add(product)
+    db.commit()
+    product_id = product.id
+    db.close()
+    cache.catalog_cache.invalidate() # As the writing process does on the shared backend
+    assert ids(client.get("/products", params={"q": "quokka"})) == []
+
+    monkeypatch.setattr(search, "SEARCH_REFRESH_SECONDS", 0)
+    for _ in range(50):
+        found = ids(client.get("/products", params={"q": "quokka"}))
+        if found:
+            break
+        time.sleep(0.1)
+    assert found == [product_id]
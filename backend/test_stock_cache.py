@@ -0,0 +1,67 @@
+import pytest
+
+import conftest # noqa: F401 (throwaway database, before the app is imported)
+
+# Checkouts and stock movements don't bump the catalog cache version, only the
+# stock one (catalog.invalidate_stock): everything cached that shows stock has
+# to be refreshed by them anyway.
+#   pytest test_stock_cache.py
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.database import SessionLocal
+from app import models, auth
+
+
+@pytest.fixture(scope="module")
+def shop():
+    db = SessionLocal()
+    db.add(models.User(email="stock-cache@test.com", hashed_password=auth.get_password_hash("pw"), is_admin=True, is_active=True))
+    db.commit()
+    db.close()
+    client = TestClient(app)
+    token = client.post("/token", data={"username": "stock-cache@test.com", "password": "pw"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    res = client.post("/products", headers=headers, json={
+        "name": "Stock Cache Product", "price": 10, "image_url": "x", "category": "StockCache",
+        "stock_quantity": 3, "min_stock": 1, "cost_price": 2,
+    })
+    assert res.status_code == 200, res.text
+    return client, headers, res.json()["id"]
+
+
+def dashboard(shop) -> dict:
+    client, headers, _ = shop
+    res = client.get("/inventory/dashboard", headers=headers)
+    assert res.status_code == 200, res.text
+    return res.json()
+
+
+def test_dashboard_after_order_and_movement(shop):
+    client, headers, product_id = shop
+    before = dashboard(shop) # Cached from here on
+
+    res = client.post("/orders", headers=headers, json={"items": [{"product_id": product_id, "quantity": 3}]})
+    assert res.status_code == 200, res.text
+    sold_out = dashboard(shop)
+    assert sold_out["out_of_stock_count"] == before["out_of_stock_count"] + 1
+    assert sold_out["total_valuation"] == pytest.approx(before["total_valuation"] - 6.0)
+
+    res = client.post("/inventory/movements", headers=headers, json={"product_id": product_id, "quantity": 10, "movement_type": "IN"})
+    assert res.status_code == 200, res.text
+    restocked = dashboard(shop)
+    assert restocked["out_of_stock_count"] == before["out_of_stock_count"]
+    assert restocked["total_valuation"] == pytest.approx(before["total_valuation"] - 6.0 + 20.0)
+
+
+def test_listing_and_product_show_current_stock(shop):
+    client, headers, product_id = shop
+    listed = lambda: next(p for p in client.get("/products", params={"category": "StockCache"}).json()["items"] if p["id"] == product_id)
+    stock = listed()["stock_quantity"]
+    assert client.get(f"/products/{product_id}").json()["stock_quantity"] == stock
+
+    res = client.post("/orders", headers=headers, json={"items": [{"product_id": product_id, "quantity": 1}]})
+    assert res.status_code == 200, res.text
+    assert listed()["stock_quantity"] == stock - 1
+    assert client.get(f"/products/{product_id}").json()["stock_quantity"] == stock - 1
@@ -0,0 +1,56 @@
+import conftest # noqa: F401 (throwaway database, before the app is imported)
+
+# Authenticated user cache: a user deactivated or demoted through one API process
+# is reloaded by the others on their next request, through the per-user version
+# kept in the shared cache backend.
+#   pytest test_user_cache.py
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.database import SessionLocal
+from app import models, schemas, auth, cache
+
+
+def worker_caches():
+    # Two processes' user caches over one shared backend
+    backend = cache.RedisCache(cache.LocalRedis())
+    workers = [auth.UserCache() for _ in range(2)]
+    for worker in workers:
+        worker.versions = cache.NamespaceCache("users", backend)
+    return workers
+
+
+def test_invalidation_reaches_other_processes():
+    first, second = worker_caches()
+    user = schemas.User(id=1, email="a@test.com", is_active=True, is_admin=True)
+    for worker in (first, second):
+        worker.set(user, worker.version(user.id))
+        assert worker.get(user.id) == user
+    first.invalidate(user.id)
+    assert first.get(user.id) is None
+    assert second.get(user.id) is None
+
+
+def test_entry_loaded_before_a_change_is_not_served():
+    first, second = worker_caches()
+    user = schemas.User(id=2, email="b@test.com", is_active=True, is_admin=False)
+    version = second.version(user.id) # Read, then the user is changed elsewhere before the load lands
+    first.invalidate(user.id)
+    second.set(user, version)
+    assert second.get(user.id) is None
+
+
+def test_deactivated_user_is_rejected():
+    db = SessionLocal()
+    for email, is_admin in (("user-cache-admin@test.com", True), ("user-cache@test.com", False)):
+        db.add(models.User(email=email, hashed_password=auth.get_password_hash("pw"), is_admin=is_admin, is_active=True))
+    db.commit()
+    user_id = db.query(models.User.id).filter(models.User.email == "user-cache@test.com").scalar()
+    db.close()
+    client = TestClient(app)
+    login = lambda email: {"Authorization": "Bearer " + client.post("/token", data={"username": email, "password": "pw"}).json()["access_token"]}
+    admin, user = login("user-cache-admin@test.com"), login("user-cache@test.com")
+    assert client.get("/users/me", headers=user).status_code == 200
+    assert client.patch(f"/admin/users/{user_id}", headers=admin, json={"is_active": False}).status_code == 200
+    assert client.get("/users/me", headers=user).status_code == 400
@@ -21,7 +21,8 @@ export interface Order {
 }
 
 export const orderService = {
-    async createOrder(items: OrderItem[]): Promise<Order | null> {
+    // Same idempotencyKey on a retry: the API returns the first order instead of placing another
+    async createOrder(items: OrderItem[], idempotencyKey?: string): Promise<Order | null> {
         const token = authService.getToken();
         if (!token) return null;
 
@@ -30,7 +31,8 @@ export const orderService = {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
-                    'Authorization': `Bearer ${token}`
+                    'Authorization': `Bearer ${token}`,
+                    ...(idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {})
                 },
                 body: JSON.stringify({ items }),
             });
@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useRouter } from "next/navigation";
 import { useCartStore } from "@/lib/store";
 import { orderService } from "@/services/order.service";
@@ -29,6 +29,12 @@ export function useCheckoutViewModel() {
 
     const totalAmount = items.reduce((sum, item) => sum + item.price * item.quantity, 0);
 
+    // One key per cart: placing the order again after a timeout can't create it twice
+    const idempotencyKey = useRef<string>(crypto.randomUUID());
+    useEffect(() => {
+        idempotencyKey.current = crypto.randomUUID();
+    }, [items]);
+
     // Ensure user is authenticated
     useEffect(() => {
         if (!authService.isAuthenticated()) {
@@ -60,7 +66,7 @@ export function useCheckoutViewModel() {
                 quantity: item.quantity
             }));
 
-            const result = await orderService.createOrder(orderItems);
+            const result = await orderService.createOrder(orderItems, idempotencyKey.current);
 
             if (result) {
                 toast.success("¡Orden completada con éxito!");